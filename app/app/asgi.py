@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# run the read-heavy views on a thread pool instead of the single
+# thread Django uses for sync views under ASGI
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
@@ -79,16 +79,95 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# core.backends.postgresql adds CONN_HEALTH_CHECKS and the optional POOL.
+# with DB_POOL on, connections go back to the in-process pool at the end of
+# each request instead of staying open for DB_CONN_MAX_AGE seconds
+DB_POOL = bool(int(os.environ.get('DB_POOL', 0)))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': bool(int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))),
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+        } if DB_POOL else None,
+    }
+}
+
+# read replicas, comma separated hosts sharing the primary's credentials.
+# core.routers sends GET/HEAD reads there unless the user changed their
+# data within READ_YOUR_WRITES_SECONDS; tests read from the primary via
+# TEST MIRROR
+REPLICA_DATABASES = []
+for number, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1,
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(
+        DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'},
+    )
+    REPLICA_DATABASES.append(alias)
+
+if REPLICA_DATABASES:
+    MIDDLEWARE.insert(1, 'core.middleware.replica_routing_middleware')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', 5))
+# how long an unreachable replica is skipped
+REPLICA_RETRY_SECONDS = int(os.environ.get('DB_REPLICA_RETRY_SECONDS', 30))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# the response cache, the token cache and the list ETags are only right
+# when every worker sees the same invalidations. LocMemCache is per
+# process, so with it they are off; set CACHE_BACKEND to a shared cache,
+# e.g. django.core.cache.backends.memcached.PyMemcacheCache, to use them
+CACHE_SHARED = not CACHES['default']['BACKEND'].endswith('LocMemCache')
+
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', 60))
+# seconds an in-process autocomplete index is used before it is rebuilt
+AUTOCOMPLETE_INDEX_TTL = int(os.environ.get('AUTOCOMPLETE_INDEX_TTL', 300))
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# the first hasher hashes new passwords, the rest still verify older hashes,
+# which are rehashed with the first one on the next successful login
+PASSWORD_HASHER_CHOICES = {
+    'argon2': 'user.hashers.TunedArgon2PasswordHasher',
+    'bcrypt': 'user.hashers.TunedBCryptSHA256PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items()
+    if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+# argon2id costs, memory in KiB; the defaults follow the OWASP minimum
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -132,6 +211,20 @@ MEDIA_URL = '/static/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# threads that resize uploaded recipe images, 0 runs jobs in the request
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+# serve the read-heavy views from a thread pool under ASGI, see
+# recipe.async_views; asgi.py switches this on
+ASYNC_READ_VIEWS = bool(int(os.environ.get('ASYNC_READ_VIEWS', 0)))
+# threads, and so database connections, used by the async path
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 16))
+# let the front server send media files: '', 'x-accel-redirect' or 'x-sendfile'
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '')
+# internal nginx location that maps to MEDIA_ROOT for X-Accel-Redirect
+MEDIA_OFFLOAD_PREFIX = os.environ.get('MEDIA_OFFLOAD_PREFIX', '/protected-media/')
+# largest image accepted by the resumable upload endpoints, in bytes
+IMAGE_UPLOAD_MAX_SIZE = int(os.environ.get('IMAGE_UPLOAD_MAX_SIZE', 20 * 1024 * 1024))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -141,7 +234,24 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_RATES': {
+        # login attempts per client address and per email address
+        'login': os.environ.get('LOGIN_THROTTLE_RATE', '10/min'),
+        'login_email': os.environ.get('LOGIN_EMAIL_THROTTLE_RATE', '5/min'),
+    },
 }
+# render and parse JSON with orjson, see core.renderers; without orjson
+# installed this behaves like DRF's own JSON classes
+if bool(int(os.environ.get('FAST_JSON', 0))):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
\ No newline at end of file
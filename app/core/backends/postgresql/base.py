@@ -0,0 +1,132 @@
+"""
+PostgreSQL backend with connection health checks and an optional pool.
+
+CONN_HEALTH_CHECKS (Django 4.1 adds the same setting) pings a persistent
+connection once per request before reusing it, so a connection the server
+dropped while idle is replaced instead of failing the request. With a POOL
+setting ({'MIN_SIZE', 'MAX_SIZE', 'TIMEOUT'}) connections come from the
+process-wide pool in core.pool and closing one hands it back.
+"""
+import functools
+
+import psycopg2.extras
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+
+from core.pool import ConnectionPool, PoolTimeout, close_pools, get_pool
+
+Database = base.Database
+
+
+def _connect(conn_params):
+    """ open a connection like the stock backend does, minus wrapper state """
+    connection = Database.connect(**conn_params)
+    # same dummy loads() the stock backend registers for JSONField
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection, loads=lambda x: x,
+    )
+    return connection
+
+
+def _ping(connection):
+    """ return whether a raw connection still answers """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """ drop pooled connections before the test database is created or dropped """
+
+    def create_test_db(self, *args, **kwargs):
+        close_pools()
+        return super().create_test_db(*args, **kwargs)
+
+    def destroy_test_db(self, *args, **kwargs):
+        close_pools()
+        return super().destroy_test_db(*args, **kwargs)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.pool = None
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    @property
+    def pool_settings(self):
+        # the test runner's connection to the 'postgres' database is never pooled
+        if self.alias == NO_DB_ALIAS:
+            return None
+        return self.settings_dict.get('POOL')
+
+    def get_new_connection(self, conn_params):
+        pool_settings = self.pool_settings
+        if not pool_settings:
+            return super().get_new_connection(conn_params)
+        pool = get_pool(self.alias, functools.partial(
+            ConnectionPool,
+            connect=functools.partial(_connect, conn_params),
+            min_size=pool_settings.get('MIN_SIZE', 1),
+            max_size=pool_settings.get('MAX_SIZE', 10),
+            timeout=pool_settings.get('TIMEOUT', 5.0),
+            check=_ping if self.health_check_enabled else None,
+        ))
+        try:
+            connection = pool.acquire()
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+        self.pool = pool
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def connect(self):
+        super().connect()
+        # the connection is new, or the pool just pinged it
+        self.health_check_done = True
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        pool, self.pool = self.pool, None
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # the wrapper keeps the connection until the atomic block
+                # exits, so it must not be handed to another thread
+                pool.discard(self.connection)
+            else:
+                pool.release(self.connection)
+
+    def close_if_health_check_failed(self):
+        """ close a reused connection that no longer answers, once per request """
+        if (
+            self.connection is None
+            or not self.health_check_enabled
+            or self.health_check_done
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # called at the start and end of every request
+        self.health_check_done = False
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
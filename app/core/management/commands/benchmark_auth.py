@@ -0,0 +1,61 @@
+"""
+command for benchmarking token authentication
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext,override_settings)
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from user.authentication import CachedTokenAuthentication
+from user.views import ManageUserView
+
+BENCH_EMAIL = 'bench-auth@example.com'
+
+
+class Command(BaseCommand):
+    """ Django command to compare queries and latency per request """
+    help = 'Compare TokenAuthentication with CachedTokenAuthentication.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        user, _ = get_user_model().objects.get_or_create(email=BENCH_EMAIL)
+        token, _ = Token.objects.get_or_create(user=user)
+        cache.clear()
+        try:
+            # this one process shares its cache, whatever the backend
+            with override_settings(CACHE_SHARED=True):
+                for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+                    self._run(auth_class, token.key, options['requests'])
+        finally:
+            user.delete()
+
+    def _run(self, auth_class, key, requests):
+        """ send GET /api/user/me/ requests and report the cost of each
+
+        the view reads the profile itself, one query of every request.
+        """
+        view = ManageUserView.as_view(authentication_classes=[auth_class])
+        factory = APIRequestFactory()
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(requests):
+                request = factory.get('/api/user/me/', HTTP_AUTHORIZATION=f'Token {key}')
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{auth_class.__name__}: '
+            f'{len(queries) / requests:.2f} queries/request  '
+            f'p50 {statistics.median(timings):.3f} ms'
+        )
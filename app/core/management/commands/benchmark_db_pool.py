@@ -0,0 +1,120 @@
+"""
+command for benchmarking database connection handling
+"""
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from core.backends.postgresql.base import DatabaseWrapper
+from core.pool import close_pools, pool_stats
+
+# CONN_MAX_AGE and POOL per mode
+MODES = {
+    'off': (0, None),
+    'persistent': (60, None),
+    'pool': (0, {'MIN_SIZE': 2, 'MAX_SIZE': 10, 'TIMEOUT': 5}),
+}
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    """ Django command to compare requests per second per connection mode
+
+    off opens a connection per request, persistent keeps one per thread for
+    CONN_MAX_AGE and pool shares --pool-size connections between the
+    threads. Requests go through the full handler, so connections are
+    closed or returned at the end of each request as under a real server.
+    The response cache is off so every request reaches the database.
+    """
+    help = 'Report requests per second with and without connection pooling.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modes', nargs='*', help=f'any of {", ".join(MODES)}')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--pool-size', type=int, default=10)
+        parser.add_argument('--path', default='/api/recipe/recipes/')
+        parser.add_argument(
+            '--email', default='bench0@example.com',
+            help='user whose token is sent, e.g. one created by seed_recipes',
+        )
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        unknown = set(options['modes']) - set(MODES)
+        if unknown:
+            raise CommandError(f'unknown modes: {", ".join(sorted(unknown))}')
+        if not isinstance(connections['default'], DatabaseWrapper):
+            raise CommandError('needs the core.backends.postgresql engine')
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'no user {options["email"]}, run seed_recipes')
+        token, _ = Token.objects.get_or_create(user=user)
+
+        settings_dict = connections['default'].settings_dict
+        saved = {key: settings_dict.get(key) for key in ('CONN_MAX_AGE', 'POOL')}
+        try:
+            for mode in options['modes'] or MODES:
+                max_age, pool = MODES[mode]
+                if pool:
+                    pool = dict(pool, MAX_SIZE=options['pool_size'])
+                # every thread's wrapper shares this dict
+                settings_dict.update(CONN_MAX_AGE=max_age, POOL=pool)
+                connections['default'].close()
+                close_pools()
+                with override_settings(CACHES=NO_CACHE, ALLOWED_HOSTS=['testserver']):
+                    self._run(mode, token.key, options)
+        finally:
+            settings_dict.update(saved)
+            connections['default'].close()
+            close_pools()
+
+    def _run(self, mode, key, options):
+        """ send the requests from several threads and report the rate """
+        timings = []
+        errors = []
+        per_thread = max(1, options['requests'] // options['threads'])
+
+        def work():
+            client = Client(HTTP_AUTHORIZATION=f'Token {key}')
+            try:
+                for _ in range(per_thread):
+                    started = time.perf_counter()
+                    response = client.get(options['path'])
+                    timings.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'{mode}: {len(timings) / elapsed:.1f} req/s  '
+            f'p50 {statistics.median(timings) * 1000:.1f} ms  '
+            f'p99 {p99 * 1000:.1f} ms  errors {len(errors)}'
+        )
+        stats = pool_stats().get('default')
+        if stats:
+            self.stdout.write(
+                f'  pool: {stats["size"]} open, {stats["waits"]} waits, '
+                f'avg wait {stats["avg_wait_ms"]} ms, '
+                f'max wait {stats["max_wait_ms"]} ms, '
+                f'{stats["timeouts"]} timeouts'
+            )
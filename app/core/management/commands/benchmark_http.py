@@ -0,0 +1,155 @@
+"""
+command for load testing a running server over HTTP
+"""
+import asyncio
+import itertools
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+
+class Command(BaseCommand):
+    """ Django command to measure requests per second and latency
+
+    start the same app under WSGI and under ASGI and point this at each,
+    e.g. after seed_recipes against the same database:
+
+        gunicorn app.wsgi -w 4 -b 127.0.0.1:8000
+        uvicorn app.asgi:application --workers 4 --port 8001
+        python manage.py benchmark_http --url http://127.0.0.1:8000/api/recipe/recipes/
+        python manage.py benchmark_http --url http://127.0.0.1:8001/api/recipe/recipes/
+
+    each client keeps one HTTP/1.1 connection open and sends requests back
+    to back for --duration seconds. Every request carries its own _bench
+    query param, so none is a response cache hit, and with the default
+    per-process cache backend the servers also skip the token cache (see
+    CACHE_SHARED): the numbers measure the database path. --cached sends
+    the same request every time instead.
+    """
+    help = 'Load test a running server at several concurrency levels.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', required=True)
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[50, 200, 1000],
+        )
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument(
+            '--cached', action='store_true',
+            help='repeat one url, so a shared response cache answers it',
+        )
+        parser.add_argument(
+            '--email', default='bench0@example.com',
+            help='user whose token is sent, e.g. one created by seed_recipes',
+        )
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError('only http:// urls are supported')
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'no user {options["email"]}, run seed_recipes')
+        token, _ = Token.objects.get_or_create(user=user)
+        query = [url.query] if url.query else []
+        numbers = itertools.count()
+
+        def request():
+            """ the next request, with a fresh cache busting param """
+            params = list(query)
+            if not options['cached']:
+                params.append(f'_bench={next(numbers)}')
+            path = url.path + (f'?{"&".join(params)}' if params else '')
+            return (
+                f'GET {path} HTTP/1.1\r\n'
+                f'Host: {url.netloc}\r\n'
+                f'Authorization: Token {token.key}\r\n'
+                'Accept: application/json\r\n'
+                '\r\n'
+            ).encode()
+
+        for clients in options['concurrency']:
+            latencies, errors, elapsed = asyncio.run(self._run(
+                url.hostname, url.port or 80, request, clients,
+                options['duration'],
+            ))
+            self._report(clients, latencies, errors, elapsed)
+
+    async def _run(self, host, port, request, clients, duration):
+        """ run the clients until the deadline and collect latencies """
+        latencies = []
+        errors = []
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            self._client(host, port, request, deadline, latencies, errors)
+            for _ in range(clients)
+        ))
+        return latencies, errors, time.perf_counter() - started
+
+    async def _client(self, host, port, request, deadline, latencies, errors):
+        """ send requests on one keep-alive connection, reconnecting on errors """
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                sent = time.perf_counter()
+                writer.write(request())
+                status, keep_alive = await _read_response(reader)
+                latencies.append(time.perf_counter() - sent)
+                if status != 200:
+                    errors.append(status)
+                if not keep_alive:
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.IncompleteReadError, ValueError) as exc:
+                errors.append(type(exc).__name__)
+                if writer is not None:
+                    writer.close()
+                writer = None
+                await asyncio.sleep(0.01)
+        if writer is not None:
+            writer.close()
+
+    def _report(self, clients, latencies, errors, elapsed):
+        if not latencies:
+            self.stdout.write(f'{clients} clients: no responses, {len(errors)} errors')
+            return
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{clients} clients: {len(latencies) / elapsed:.1f} req/s  '
+            f'p50 {statistics.median(latencies) * 1000:.1f} ms  '
+            f'p99 {p99 * 1000:.1f} ms  errors {len(errors)}'
+        )
+
+
+async def _read_response(reader):
+    """ read one response, return its status and whether to keep the connection """
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection') != 'close'
@@ -0,0 +1,90 @@
+"""
+command for benchmarking the JSON renderers and parsers
+"""
+import datetime
+import io
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer, orjson
+
+
+def build_payload(recipes):
+    """ a cursor page shaped like the recipe list, prices and dates unrendered """
+    modified = timezone.now()
+    return {
+        'next': None,
+        'previous': None,
+        'results': [
+            {
+                'id': number,
+                'title': f'Recipe {number} à la carte',
+                'time_minutes': number % 120,
+                'price': Decimal(number % 10000) / 100,
+                'link': f'https://example.com/recipes/{number}',
+                'tag': [
+                    {'id': tag, 'name': f'Tag {tag}'} for tag in range(3)
+                ],
+                'ingredients': [
+                    {'id': ingredient, 'name': f'Ingredient {ingredient}'}
+                    for ingredient in range(5)
+                ],
+                'image_variants': {},
+                'modified_at': modified - datetime.timedelta(minutes=number),
+            }
+            for number in range(recipes)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    """ Django command to compare stdlib and orjson rendering and parsing
+
+    renders the same list payload with JSONRenderer and ORJSONRenderer,
+    checks both produce the same bytes, then parses them back with
+    JSONParser and ORJSONParser.
+    """
+    help = 'Report JSON render and parse times for a recipe list payload.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        if orjson is None:
+            self.stdout.write('orjson is not installed, ORJSONRenderer uses the stdlib')
+        payload = build_payload(options['recipes'])
+        expected = JSONRenderer().render(payload)
+        if ORJSONRenderer().render(payload) != expected:
+            raise CommandError('ORJSONRenderer output differs from JSONRenderer')
+        self.stdout.write(
+            f'{options["recipes"]} recipes, {len(expected) / 1024 / 1024:.1f} MB'
+        )
+
+        rounds = options['rounds']
+        for name, renderer in (('json', JSONRenderer()), ('orjson', ORJSONRenderer())):
+            self._report(f'render {name}', rounds, lambda: renderer.render(payload))
+        for name, parser in (('json', JSONParser()), ('orjson', ORJSONParser())):
+            self._report(
+                f'parse {name}', rounds,
+                lambda: parser.parse(io.BytesIO(expected), 'application/json'),
+            )
+
+    def _report(self, name, rounds, func):
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f'{name}: median {statistics.median(timings) * 1000:.1f} ms  '
+            f'best {min(timings) * 1000:.1f} ms'
+        )
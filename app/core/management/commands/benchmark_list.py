@@ -0,0 +1,66 @@
+"""
+command for benchmarking the recipe list serialization paths
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from recipe.views import RecipeViewSet
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    """ Django command to compare RecipeSerializer and the fast list path
+
+    requests the same list page through RecipeViewSet with fast_list off
+    and on, checks both give the same bytes, and reports the throughput of
+    each. The response cache is off so every request builds the page.
+    """
+    help = 'Report recipe list throughput with and without the fast path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--rounds', type=int, default=50)
+        parser.add_argument(
+            '--email', default='bench0@example.com',
+            help='user whose recipes are listed, e.g. one created by seed_recipes',
+        )
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'no user {options["email"]}, run seed_recipes')
+        path = f'/api/recipe/recipes/?page_size={options["page_size"]}'
+        factory = APIRequestFactory()
+
+        def get(view):
+            request = factory.get(path)
+            force_authenticate(request, user=user)
+            return view(request).render().content
+
+        views = {
+            'serializer': RecipeViewSet.as_view({'get': 'list'}, fast_list=False),
+            'fast': RecipeViewSet.as_view({'get': 'list'}, fast_list=True),
+        }
+        with override_settings(CACHES=NO_CACHE, ALLOWED_HOSTS=['testserver']):
+            if get(views['serializer']) != get(views['fast']):
+                raise CommandError('the fast list differs from RecipeSerializer')
+            for name, view in views.items():
+                timings = []
+                for _ in range(options['rounds']):
+                    started = time.perf_counter()
+                    get(view)
+                    timings.append(time.perf_counter() - started)
+                median = statistics.median(timings)
+                self.stdout.write(
+                    f'{name}: {1 / median:.1f} pages/s  '
+                    f'{options["page_size"] / median:.0f} recipes/s  '
+                    f'median {median * 1000:.1f} ms'
+                )
@@ -0,0 +1,74 @@
+"""
+command for benchmarking logins per password hasher
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from user.views import CreateTokenView
+
+BENCH_EMAIL = 'bench-login@example.com'
+BENCH_PASSWORD = 'bench-password-123'
+
+
+class Command(BaseCommand):
+    """ Django command to measure a login storm on one worker
+
+    every login goes through CreateTokenView without throttles, so the
+    numbers show how many logins a single worker thread can verify per
+    second with each hasher.
+    """
+    help = 'Report logins per second per worker for each password hasher.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50)
+        parser.add_argument(
+            'hashers', nargs='*',
+            help=f'any of {", ".join(settings.PASSWORD_HASHER_CHOICES)}',
+        )
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        choices = settings.PASSWORD_HASHER_CHOICES
+        unknown = set(options['hashers']) - set(choices)
+        if unknown:
+            raise CommandError(f'unknown hashers: {", ".join(sorted(unknown))}')
+        for name in options['hashers'] or choices:
+            hashers = [choices[name]] + [
+                hasher for hasher in settings.PASSWORD_HASHERS
+                if hasher != choices[name]
+            ]
+            with override_settings(PASSWORD_HASHERS=hashers):
+                self._run(name, options['logins'])
+
+    def _run(self, name, logins):
+        """ log the bench user in repeatedly and report the rate """
+        user = get_user_model().objects.create_user(BENCH_EMAIL, BENCH_PASSWORD)
+        view = CreateTokenView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        payload = {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}
+        timings = []
+        try:
+            for _ in range(logins):
+                request = factory.post('/api/user/token/', payload, format='json')
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f'{name}: login failed {response.data}')
+        finally:
+            user.delete()
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'{name}: {len(timings) / sum(timings):.1f} logins/s/worker  '
+            f'p50 {statistics.median(timings) * 1000:.1f} ms  '
+            f'p99 {p99 * 1000:.1f} ms'
+        )
@@ -0,0 +1,182 @@
+"""
+command for benchmarking the hot API queries
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from core.models import (Recipe,Tag,Ingredient)
+from recipe.filters import (MATCH_ALL,filter_assigned,filter_by_related)
+from recipe.search import search_recipes
+
+
+def recipe_list(user):
+    """ first page of RecipeViewSet """
+    return Recipe.objects.filter(user=user).order_by('-id')[:25]
+
+
+def tag_list(user):
+    """ first page of TagViewSet """
+    return Tag.objects.filter(user=user).order_by('-name')[:25]
+
+
+def ingredient_list(user):
+    """ first page of IngredientViewSet """
+    return Ingredient.objects.filter(user=user).order_by('-name')[:25]
+
+
+def tag_lookup(user):
+    """ name lookup done when resolving recipe tags """
+    return Tag.objects.filter(user=user, name__in=['tag 1', 'tag 2', 'tag 3'])
+
+
+def _some_tag_ids(user):
+    """ ids of a few tags the user has """
+    return list(
+        Tag.objects.filter(user=user).order_by('id').values_list('id', flat=True)[:3]
+    )
+
+
+def recipe_tag_join_distinct(user):
+    """ tag filter as a join plus DISTINCT, the old strategy """
+    return Recipe.objects.filter(
+        user=user, tag__id__in=_some_tag_ids(user),
+    ).order_by('-id').distinct()[:25]
+
+
+def recipe_tag_exists(user):
+    """ tag filter as an EXISTS semi-join matching any tag """
+    return filter_by_related(
+        Recipe.objects.filter(user=user), 'tag', _some_tag_ids(user),
+    ).order_by('-id')[:25]
+
+
+def recipe_tag_exists_all(user):
+    """ tag filter as EXISTS semi-joins matching all tags """
+    return filter_by_related(
+        Recipe.objects.filter(user=user), 'tag', _some_tag_ids(user)[:2],
+        MATCH_ALL,
+    ).order_by('-id')[:25]
+
+
+def tag_assigned_join_distinct(user):
+    """ assigned_only as a join plus DISTINCT, the old strategy """
+    return Tag.objects.filter(
+        user=user, recipe__isnull=False,
+    ).order_by('-name').distinct()[:25]
+
+
+def tag_assigned_exists(user):
+    """ assigned_only as an EXISTS semi-join """
+    return filter_assigned(Tag.objects.filter(user=user)).order_by('-name')[:25]
+
+
+def tag_assigned_counter(user):
+    """ assigned_only from the usage counter, what BaseView runs """
+    return Tag.objects.filter(user=user, usage_count__gt=0).order_by('-name')[:25]
+
+
+def recipe_search(user):
+    """ first page of a ranked search, words from seed_recipes titles """
+    return search_recipes(
+        Recipe.objects.filter(user=user), 'spicy curry',
+    ).order_by('-rank', '-id')[:25]
+
+
+def recipe_range(user):
+    """ max_time and max_price filters on the default order """
+    return Recipe.objects.filter(
+        user=user, time_minutes__lte=30, price__lte=10,
+    ).order_by('-id')[:25]
+
+
+def recipe_order_price(user):
+    """ ordering=price, served from the (user, price, id) index """
+    return Recipe.objects.filter(user=user).order_by('price', 'id')[:25]
+
+
+QUERIES = {
+    'recipe_list': recipe_list,
+    'tag_list': tag_list,
+    'ingredient_list': ingredient_list,
+    'tag_lookup': tag_lookup,
+    'recipe_tag_join_distinct': recipe_tag_join_distinct,
+    'recipe_tag_exists': recipe_tag_exists,
+    'recipe_tag_exists_all': recipe_tag_exists_all,
+    'tag_assigned_join_distinct': tag_assigned_join_distinct,
+    'tag_assigned_exists': tag_assigned_exists,
+    'tag_assigned_counter': tag_assigned_counter,
+    'recipe_search': recipe_search,
+    'recipe_range': recipe_range,
+    'recipe_order_price': recipe_order_price,
+}
+
+
+class Command(BaseCommand):
+    """ Django command to print query plans and latencies
+
+    run it once before and once after applying a migration to compare
+    plans, e.g. against data created by the seed_recipes command. to
+    compare at several sizes, reseed with --recipes 10000, 100000 and
+    1000000 and run it after each.
+    """
+    help = 'Print EXPLAIN output and latency for the hot API queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'queries', nargs='*', help=f'any of {", ".join(QUERIES)}',
+        )
+        parser.add_argument('--email', help='user to run queries for')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--no-explain', action='store_true')
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        unknown = set(options['queries']) - set(QUERIES)
+        if unknown:
+            raise CommandError(f'unknown queries: {", ".join(sorted(unknown))}')
+        user = self._get_user(options['email'])
+        self.stdout.write(
+            f'{connection.vendor}: user {user.email} with '
+            f'{Recipe.objects.filter(user=user).count()} recipes'
+        )
+        for name in options['queries'] or QUERIES:
+            queryset = QUERIES[name](user)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            if not options['no_explain']:
+                self.stdout.write(self._explain(queryset))
+            timings = self._time(queryset, options['repeat'])
+            self.stdout.write(
+                f'p50 {statistics.median(timings):.2f} ms  '
+                f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms  '
+                f'max {timings[-1]:.2f} ms'
+            )
+
+    def _get_user(self, email):
+        """ return the given user or the one with most recipes """
+        users = get_user_model().objects.all()
+        if email:
+            users = users.filter(email=email)
+        user = users.annotate(n=Count('recipe')).order_by('-n').first()
+        if user is None:
+            raise CommandError('no user found, run seed_recipes first')
+        return user
+
+    def _explain(self, queryset):
+        """ return the query plan, with run times where supported """
+        if connection.vendor == 'postgresql':
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
+
+    def _time(self, queryset, repeat):
+        """ run the query repeat times and return sorted timings in ms """
+        timings = []
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)
@@ -0,0 +1,165 @@
+"""
+command for removing recipe images no recipe uses any more
+"""
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import (Count,Q)
+from django.utils import timezone
+
+from core.models import (ImageBlob,ImageUpload,Recipe)
+from recipe.images import (VARIANTS,VARIANT_DIR,variant_name)
+from recipe.uploads import UPLOAD_EXPIRY
+
+IMAGE_DIR = os.path.join('uploads', 'recipe')
+PARTIAL_DIR = os.path.join(IMAGE_DIR, 'partial')
+# files this young may belong to an upload whose recipe is not saved yet
+ORPHAN_GRACE = timedelta(hours=1)
+# blobs released this recently may be in use by a request still running
+RELEASE_GRACE = timedelta(hours=1)
+
+
+class Command(BaseCommand):
+    """ Django command to garbage collect unreferenced image files """
+    help = 'Delete image blobs and variants that no recipe references.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='recompute reference counts from Recipe.image first',
+        )
+        parser.add_argument(
+            '--orphans', action='store_true',
+            help='also delete files under uploads/recipe that nothing tracks',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        self.dry_run = options['dry_run']
+        self.storage = Recipe._meta.get_field('image').storage
+        if options['recount']:
+            self._recount()
+
+        freed = 0
+        removed = 0
+        cutoff = timezone.now() - RELEASE_GRACE
+        released = ImageBlob.objects.filter(ref_count__lte=0).filter(
+            Q(released_at__lt=cutoff)
+            | Q(released_at__isnull=True, created_at__lt=cutoff)
+        )
+        for blob_id in released.values_list('id', flat=True):
+            with transaction.atomic():
+                # a recipe may have taken the image again since the query
+                blob = ImageBlob.objects.select_for_update().filter(
+                    id=blob_id, ref_count__lte=0,
+                ).first()
+                if blob is None or Recipe.objects.filter(image=blob.name).exists():
+                    # retained, or the counter drifted, trust the recipes
+                    continue
+                freed += self._delete_image(blob.name)
+                removed += 1
+                if not self.dry_run:
+                    blob.delete()
+
+        expired, expired_bytes = self._delete_expired_uploads()
+        removed += expired
+        freed += expired_bytes
+
+        if options['orphans']:
+            orphans, orphan_bytes = self._delete_orphans()
+            removed += orphans
+            freed += orphan_bytes
+
+        self.stdout.write(self.style.SUCCESS(
+            f'removed {removed} images, freed {freed} bytes'
+            + (' (dry run)' if self.dry_run else '')
+        ))
+
+    def _recount(self):
+        """ set every blob count to the number of recipes using it """
+        counts = dict(
+            Recipe.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('image').annotate(n=Count('id'))
+        )
+        for name in counts.keys() - set(
+            ImageBlob.objects.filter(name__in=counts).values_list('name', flat=True)
+        ):
+            size = self.storage.size(name) if self.storage.exists(name) else 0
+            ImageBlob.objects.create(name=name, size=size)
+        for blob in ImageBlob.objects.all():
+            if blob.ref_count != counts.get(blob.name, 0):
+                blob.ref_count = counts.get(blob.name, 0)
+                if not blob.ref_count:
+                    blob.released_at = timezone.now()
+                blob.save(update_fields=['ref_count', 'released_at'])
+
+    def _delete(self, storage, name):
+        """ delete one file and return its size """
+        if not storage.exists(name):
+            return 0
+        size = storage.size(name)
+        self.stdout.write(f'delete {name}')
+        if not self.dry_run:
+            storage.delete(name)
+        return size
+
+    def _delete_image(self, name):
+        """ delete an image and its variants """
+        freed = self._delete(self.storage, name)
+        for variant in VARIANTS:
+            freed += self._delete(default_storage, variant_name(name, variant))
+        return freed
+
+    def _delete_expired_uploads(self):
+        """ drop resumable uploads nobody has continued for a while """
+        expired = ImageUpload.objects.filter(
+            updated_at__lt=timezone.now() - UPLOAD_EXPIRY,
+        )
+        removed = 0
+        freed = 0
+        for upload in expired:
+            freed += self._delete(self.storage, upload.partial_name)
+            removed += 1
+            if not self.dry_run:
+                upload.delete()
+        return removed, freed
+
+    def _delete_orphans(self):
+        """ delete files under the image directory that nothing references """
+        used = set(ImageBlob.objects.values_list('name', flat=True))
+        used |= set(
+            Recipe.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('image', flat=True)
+        )
+        used_variants = {
+            variant_name(name, variant) for name in used for variant in VARIANTS
+        }
+        cutoff = timezone.now() - ORPHAN_GRACE
+        removed = 0
+        freed = 0
+        for name in self._walk(IMAGE_DIR):
+            if name.startswith(PARTIAL_DIR + '/'):
+                # uploads in progress, expired ones are handled above
+                continue
+            in_variants = name.startswith(VARIANT_DIR + '/')
+            if name in (used_variants if in_variants else used):
+                continue
+            if self.storage.get_modified_time(name) > cutoff:
+                continue
+            freed += self._delete(self.storage, name)
+            removed += 1
+        return removed, freed
+
+    def _walk(self, directory):
+        """ yield the names of all files below a storage directory """
+        if not self.storage.exists(directory):
+            return
+        directories, files = self.storage.listdir(directory)
+        for name in files:
+            yield f'{directory}/{name}'
+        for sub in directories:
+            yield from self._walk(f'{directory}/{sub}')
@@ -0,0 +1,32 @@
+"""
+command for running recipe image jobs
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import ImageJob
+from recipe.images import run_job
+
+
+class Command(BaseCommand):
+    """ Django command to run pending image jobs, e.g. after a restart """
+    help = 'Process pending recipe image jobs in this process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='queue failed and interrupted jobs again first',
+        )
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        if options['retry_failed']:
+            ImageJob.objects.filter(
+                status__in=[ImageJob.FAILED, ImageJob.PROCESSING],
+            ).update(status=ImageJob.PENDING)
+        job_ids = list(
+            ImageJob.objects.filter(status=ImageJob.PENDING)
+            .order_by('id').values_list('id', flat=True)
+        )
+        for job_id in job_ids:
+            run_job(job_id)
+        self.stdout.write(self.style.SUCCESS(f'processed {len(job_ids)} jobs'))
@@ -0,0 +1,39 @@
+"""
+command for repairing tag and ingredient usage counters
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipe.usage import (RECIPE_FIELDS,actual_usage)
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    """ Django command to recompute usage_count from the recipe links """
+    help = 'Recount how many recipes use each tag and ingredient.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='only report rows whose counter drifted',
+        )
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        for model in RECIPE_FIELDS:
+            drifted = list(
+                model.objects.annotate(actual=actual_usage(model))
+                .exclude(usage_count=F('actual'))
+                .values_list('id', flat=True)
+            )
+            if not options['dry_run']:
+                for start in range(0, len(drifted), BATCH_SIZE):
+                    model.objects.filter(
+                        id__in=drifted[start:start + BATCH_SIZE],
+                    ).update(usage_count=actual_usage(model))
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {len(drifted)} drifted'
+                + (' (dry run)' if options['dry_run'] else ', repaired')
+            )
+        self.stdout.write(self.style.SUCCESS('recount finished'))
@@ -0,0 +1,107 @@
+"""
+command for seeding benchmark data
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import (Recipe,Tag,Ingredient)
+from recipe.search import update_search_vectors
+from recipe.usage import (adjust_usage,count_links)
+
+# words for titles, so search benchmarks have realistic selectivity
+DISHES = (
+    'soup', 'salad', 'curry', 'pasta', 'stew', 'pie', 'cake', 'bread',
+    'risotto', 'tacos', 'noodles', 'omelette', 'pancakes', 'chili',
+)
+STYLES = (
+    'spicy', 'creamy', 'vegan', 'roasted', 'grilled', 'quick', 'lemon',
+    'garlic', 'smoky', 'sweet', 'herby', 'classic',
+)
+
+
+class Command(BaseCommand):
+    """ Django command to seed users, recipes, tags and ingredients """
+    help = 'Bulk insert benchmark recipes for a set of bench users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=50,
+                            help='tags and ingredients per user')
+        parser.add_argument('--links', type=int, default=3,
+                            help='tags and ingredients per recipe')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """ Entry point for command"""
+        rng = random.Random(options['seed'])
+        users = [
+            get_user_model().objects.get_or_create(
+                email=f'bench{i}@example.com',
+            )[0]
+            for i in range(options['users'])
+        ]
+        pools = {}
+        for user in users:
+            pools[user.id] = (
+                self._pool(Tag, user, options['tags']),
+                self._pool(Ingredient, user, options['tags']),
+            )
+
+        total = options['recipes']
+        batch_size = options['batch_size']
+        links = options['links']
+        for start in range(0, total, batch_size):
+            count = min(batch_size, total - start)
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create([
+                    Recipe(
+                        user=rng.choice(users),
+                        title=(
+                            f'{rng.choice(STYLES)} {rng.choice(DISHES)} '
+                            f'{start + i}'
+                        ),
+                        description='seeded for benchmarks',
+                        time_minutes=rng.randint(1, 240),
+                        price=Decimal(rng.randint(100, 99999)) / 100,
+                    )
+                    for i in range(count)
+                ])
+                if recipes[0].pk is None:
+                    recipes = list(Recipe.objects.order_by('-id')[:count])
+                tag_links = []
+                ingredient_links = []
+                for recipe in recipes:
+                    tags, ingredients = pools[recipe.user_id]
+                    for tag_id in rng.sample(tags, min(links, len(tags))):
+                        tag_links.append(Recipe.tag.through(
+                            recipe_id=recipe.id, tag_id=tag_id,
+                        ))
+                    for ingredient_id in rng.sample(
+                        ingredients, min(links, len(ingredients))
+                    ):
+                        ingredient_links.append(Recipe.ingredients.through(
+                            recipe_id=recipe.id, ingredient_id=ingredient_id,
+                        ))
+                Recipe.tag.through.objects.bulk_create(tag_links)
+                Recipe.ingredients.through.objects.bulk_create(ingredient_links)
+                adjust_usage(Tag, count_links(tag_links, Tag))
+                adjust_usage(Ingredient, count_links(ingredient_links, Ingredient))
+                update_search_vectors(pk__in=[recipe.id for recipe in recipes])
+            self.stdout.write(f'seeded {start + count}/{total} recipes')
+
+        self.stdout.write(self.style.SUCCESS('seeding finished'))
+
+    def _pool(self, model, user, size):
+        """ create a pool of named rows for a user and return their ids """
+        model.objects.bulk_create(
+            [model(user=user, name=f'{model.__name__.lower()} {i}')
+             for i in range(size)],
+            ignore_conflicts=True,
+        )
+        return list(model.objects.filter(user=user).values_list('id', flat=True))
@@ -0,0 +1,35 @@
+"""
+Middleware for routing requests between the primary and the replicas.
+"""
+import asyncio
+
+from django.utils.decorators import sync_and_async_middleware
+
+from core.routers import end_request, start_request
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """ let safe requests read from replicas, see core.routers
+
+    async capable, so under ASGI requests don't all funnel through the one
+    shared sync thread and the views offloaded by recipe.async_views keep
+    running in parallel. settings.py only installs it with replicas.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = start_request(request.method in SAFE_METHODS)
+            try:
+                return await get_response(request)
+            finally:
+                end_request(token)
+    else:
+        def middleware(request):
+            token = start_request(request.method in SAFE_METHODS)
+            try:
+                return get_response(request)
+            finally:
+                end_request(token)
+    return middleware
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:03
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """ merge tags and ingredients that share a name for the same user """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tag', 'tag'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        fk = f'{model._meta.model_name}_id'
+        duplicates = (
+            model.objects.values('user_id', 'name')
+            .annotate(keep=Min('id'), total=Count('id'))
+            .filter(total__gt=1)
+        )
+        for duplicate in duplicates:
+            keep = duplicate['keep']
+            drop = list(
+                model.objects.filter(
+                    user_id=duplicate['user_id'], name=duplicate['name'],
+                ).exclude(id=keep).values_list('id', flat=True)
+            )
+            linked = set(
+                through.objects.filter(**{fk: keep})
+                .values_list('recipe_id', flat=True)
+            )
+            for link in through.objects.filter(**{f'{fk}__in': drop}):
+                if link.recipe_id in linked:
+                    link.delete()
+                else:
+                    setattr(link, fk, keep)
+                    link.save()
+                    linked.add(link.recipe_id)
+            model.objects.filter(id__in=drop).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
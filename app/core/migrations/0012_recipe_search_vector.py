@@ -0,0 +1,52 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:21
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# kept in step with recipe.search.search_vector
+BACKFILL = """
+UPDATE core_recipe r SET search_vector =
+    setweight(to_tsvector('english', coalesce(r.title, '')), 'A')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ') FROM core_recipe_tag rt
+        JOIN core_tag t ON t.id = rt.tag_id WHERE rt.recipe_id = r.id
+    ), '')), 'B')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(i.name, ' ') FROM core_recipe_ingredients ri
+        JOIN core_ingredient i ON i.id = ri.ingredient_id WHERE ri.recipe_id = r.id
+    ), '')), 'B')
+    || setweight(to_tsvector('english', coalesce(r.description, '')), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """ backfill vectors and add the GIN index, on Postgres only """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(BACKFILL)
+    schema_editor.execute(
+        'CREATE INDEX recipe_search_vector_idx ON core_recipe '
+        'USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_imageupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:26
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_usage(apps, schema_editor):
+    """ set the counters from the existing recipe links """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tag', 'tag'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        column = f'{model._meta.model_name}_id'
+        model.objects.update(usage_count=Coalesce(
+            Subquery(
+                through.objects.filter(**{column: OuterRef('pk')})
+                .values(column)
+                .annotate(total=Count('id'))
+                .values('total'),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_range_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='usage_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_usage, migrations.RunPython.noop),
+    ]
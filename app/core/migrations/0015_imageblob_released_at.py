@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_usage_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageblob',
+            name='released_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,12 +1,14 @@
 import uuid
 import os
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin
 )
 from django.conf import settings
+from core.storage import recipe_image_storage
 
 
 def recipe_image_file_path(instance,filename):
@@ -65,7 +67,32 @@ class Recipe(models.Model):
     link= models.CharField(max_length=255,blank=True)
     tag= models.ManyToManyField('Tag')
     ingredients= models.ManyToManyField('Ingredient')
-    image= models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image= models.ImageField(
+        null=True, upload_to=recipe_image_file_path,
+        storage=recipe_image_storage,
+    )
+    image_status= models.CharField(max_length=20, blank=True)
+    image_variants= models.JSONField(default=dict, blank=True)
+    modified_at= models.DateTimeField(auto_now=True)
+    # maintained by recipe.search, GIN indexed on Postgres only
+    search_vector= SearchVectorField(null=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_desc_idx'),
+            # range filters and ordering by time or price, id breaks ties
+            models.Index(
+                fields=['user', 'time_minutes', 'id'], name='recipe_user_time_idx',
+            ),
+            models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so blob reference counts can follow image changes
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
     
     def __str__(self):
         return self.title
@@ -73,6 +100,16 @@ class Recipe(models.Model):
 class Tag(models.Model):
     user= models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name= models.CharField(max_length=255)
+    modified_at= models.DateTimeField(auto_now=True)
+    # number of linked recipes, maintained by recipe.usage
+    usage_count= models.IntegerField(default=0, editable=False)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'], name='unique_tag_name_per_user',
+            ),
+        ]
     
     def __str__(self):
         return self.name
@@ -80,6 +117,78 @@ class Tag(models.Model):
 class Ingredient(models.Model):
     user= models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name= models.CharField(max_length=255)
+    modified_at= models.DateTimeField(auto_now=True)
+    # number of linked recipes, maintained by recipe.usage
+    usage_count= models.IntegerField(default=0, editable=False)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'], name='unique_ingredient_name_per_user',
+            ),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+
+class ImageJob(models.Model):
+    """ background job that processes an uploaded recipe image """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    recipe= models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='image_jobs',
+    )
+    status= models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING, db_index=True,
+    )
+    attempts= models.PositiveSmallIntegerField(default=0)
+    error= models.TextField(blank=True)
+    created_at= models.DateTimeField(auto_now_add=True)
+    updated_at= models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.recipe_id} {self.status}'
+
+
+class ImageBlob(models.Model):
+    """ stored image file with the number of recipes using it """
+    name= models.CharField(max_length=255, unique=True)
+    size= models.PositiveBigIntegerField(default=0)
+    ref_count= models.IntegerField(default=0, db_index=True)
+    created_at= models.DateTimeField(auto_now_add=True)
+    # when the last recipe using it let go, gc_images waits a while after
+    released_at= models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.ref_count})'
+
+
+class ImageUpload(models.Model):
+    """ resumable upload of a recipe image, appended to in chunks """
+    id= models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe= models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='image_uploads',
+    )
+    length= models.PositiveBigIntegerField()
+    offset= models.PositiveBigIntegerField(default=0)
+    created_at= models.DateTimeField(auto_now_add=True)
+    updated_at= models.DateTimeField(auto_now=True)
+
+    @property
+    def partial_name(self):
+        """ storage name of the file the chunks are appended to """
+        return os.path.join('uploads', 'recipe', 'partial', str(self.id))
+
+    def __str__(self):
+        return f'{self.id} {self.offset}/{self.length}'
+
@@ -0,0 +1,193 @@
+"""
+In-process connection pool for the postgresql backend.
+
+with DB_POOL on, core.backends.postgresql takes its connections from a
+ConnectionPool instead of opening one per request, and closing the Django
+connection hands it back. Each worker process has one pool per database
+alias, shared by all its threads.
+"""
+import collections
+import threading
+import time
+
+from psycopg2 import extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """ no connection became free within the acquire timeout """
+
+
+class ConnectionPool:
+    """ a bounded pool of open DB-API connections
+
+    connect opens a new connection and check, if given, runs on an idle
+    connection before handing it out again and returns whether it still
+    works. Connections are reused last in, first out so the busy ones stay
+    warm and the rest can be dropped by the server's idle timeout.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, check=None):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError('pool size must satisfy 0 <= min_size <= max_size, max_size >= 1')
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._connect = connect
+        self._check = check
+        self._idle = collections.deque()
+        self._size = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {
+            'acquired': 0, 'created': 0, 'discarded': 0,
+            'waits': 0, 'timeouts': 0,
+            'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+        }
+        for _ in range(min_size):
+            self._idle.append(self._connect())
+            self._size += 1
+            self._stats['created'] += 1
+
+    def acquire(self):
+        """ return an open connection, waiting up to timeout for a free one """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            conn = self._reserve(started, deadline)
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    self._free_slot()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                return conn
+            if self._check is None or self._usable(conn):
+                return conn
+            self.discard(conn)
+
+    def release(self, conn):
+        """ return a connection, rolling back or dropping it as needed """
+        healthy = not conn.closed
+        if healthy:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    healthy = False
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                healthy = False
+        if not healthy:
+            self.discard(conn)
+            return
+        with self._cond:
+            if not self._closed:
+                self._in_use -= 1
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+        self.discard(conn)
+
+    def discard(self, conn):
+        """ close an acquired connection and free its slot """
+        self._free_slot(discarded=1)
+        _close_quietly(conn)
+
+    def close(self):
+        """ close the idle connections, in-use ones close on release """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), collections.deque()
+            self._size -= len(idle)
+        for conn in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        """ return the pool size and the counters since it was created """
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                min_size=self.min_size, max_size=self.max_size,
+                size=self._size, in_use=self._in_use, idle=len(self._idle),
+            )
+        wait = stats.pop('wait_seconds')
+        stats['avg_wait_ms'] = round(wait * 1000 / stats['acquired'], 3) if stats['acquired'] else 0
+        stats['max_wait_ms'] = round(stats.pop('max_wait_seconds') * 1000, 3)
+        return stats
+
+    def _reserve(self, started, deadline):
+        """ take an idle connection, or a slot for a new one (None) """
+        with self._cond:
+            waited = False
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'no database connection free after {self.timeout}s '
+                        f'({self._in_use} of {self.max_size} in use)'
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = None
+                self._size += 1
+            self._in_use += 1
+            waited_for = time.monotonic() - started
+            self._stats['acquired'] += 1
+            self._stats['waits'] += waited
+            self._stats['wait_seconds'] += waited_for
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited_for)
+            return conn
+
+    def _usable(self, conn):
+        try:
+            return bool(self._check(conn))
+        except Exception:
+            return False
+
+    def _free_slot(self, discarded=0):
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._stats['discarded'] += discarded
+            self._cond.notify()
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def get_pool(alias, factory):
+    """ return the pool for a database alias, creating it with factory() """
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = factory()
+        return _pools[alias]
+
+
+def pool_stats():
+    """ return the stats of every pool in this process, by alias """
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def close_pools():
+    """ close and forget every pool in this process """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,41 @@
+"""
+JSON renderer on top of orjson.
+
+the output matches DRF's compact JSONRenderer: non-ASCII stays UTF-8,
+U+2028/U+2029 are escaped, and anything orjson doesn't handle the same
+way itself (Decimal, datetime, date, time, lazy strings, ...) goes through
+DRF's JSONEncoder.default, so prices render as numbers and datetimes as
+ISO 8601 with a Z suffix either way. Without orjson installed, or for
+indented output, it renders with the stdlib like JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """ renderer producing JSONRenderer's bytes, faster """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers past 64 bits, which the stdlib handles
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
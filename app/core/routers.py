@@ -0,0 +1,125 @@
+"""
+Database router sending safe-method reads to the read replicas.
+
+core.middleware marks each GET/HEAD request as replica-safe, and the
+router then reads from one replica per request. Everything else goes to
+the primary: writes, reads inside transactions, reads outside requests,
+token and user lookups (a token created at login must work at once), and
+every read of a user who changed their recipes, tags or ingredients within
+READ_YOUR_WRITES_SECONDS. That last window is kept on the server, from the
+per-user modified time in recipe.cache, so it holds for all of the user's
+clients and no lagging replica read gets cached under the new version. A
+replica that can't be reached is skipped for REPLICA_RETRY_SECONDS.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from recipe.cache import get_user_modified
+
+logger = logging.getLogger(__name__)
+
+# models always read from the primary
+PRIMARY_MODELS = {'authtoken.Token', settings.AUTH_USER_MODEL}
+
+# per request: {'replica': may read from a replica, 'alias': the one
+# picked, 'user_id': the authenticated user}, None outside requests
+_routing = contextvars.ContextVar('db_routing', default=None)
+
+_down_until = {}
+_down_lock = threading.Lock()
+
+
+def start_request(use_replica):
+    """ begin routing for a request, return the token for end_request """
+    return _routing.set({'replica': use_replica, 'alias': None, 'user_id': None})
+
+
+def end_request(token):
+    """ stop routing for a request """
+    _routing.reset(token)
+
+
+def set_request_user(user_id):
+    """ tell the router who the current request is authenticated as """
+    state = _routing.get()
+    if state is not None:
+        state['user_id'] = user_id
+
+
+def wrote_recently(user_id):
+    """ whether a user's last change may not have reached the replicas """
+    modified = get_user_modified(user_id)
+    # the modified time is rounded down to the second
+    if modified is None:
+        return False
+    return time.time() < modified + settings.READ_YOUR_WRITES_SECONDS + 1
+
+
+def replica_available(alias):
+    """ return whether a replica answers, remembering failures for a while """
+    with _down_lock:
+        if _down_until.get(alias, 0) > time.monotonic():
+            return False
+    connection = connections[alias]
+    if connection.connection is not None:
+        return True
+    try:
+        connection.ensure_connection()
+    except DatabaseError:
+        logger.warning('replica %s unavailable, reading from the primary', alias)
+        with _down_lock:
+            _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+
+def _pick_replica():
+    replicas = list(settings.REPLICA_DATABASES)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if replica_available(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """ route reads to a replica when the current request allows it """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (
+            state is None
+            or not state['replica']
+            or model._meta.label in PRIMARY_MODELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        if state['alias'] is None:
+            # one database per request, so its reads share one snapshot
+            if state['user_id'] is not None and wrote_recently(state['user_id']):
+                state['alias'] = DEFAULT_DB_ALIAS
+            else:
+                state['alias'] = _pick_replica()
+        return state['alias']
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # later reads in this request must see the write
+            state['replica'] = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
@@ -0,0 +1,69 @@
+"""
+content addressed storage for uploaded images
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """ store each distinct file once, named after its sha256 digest
+
+    the directory and extension of the requested name are kept, the rest
+    becomes <digest[:2]>/<digest><ext>. saving content that already exists
+    writes nothing and returns the existing name.
+    """
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+
+        digest = hashlib.sha256()
+        if hasattr(content, 'temporary_file_path'):
+            # large uploads already sit in a temp file, hash it and move it
+            source = content.temporary_file_path()
+            with open(source, 'rb') as file:
+                for chunk in iter(lambda: file.read(64 * 1024), b''):
+                    digest.update(chunk)
+        else:
+            # hash first, content that is already stored is never written
+            source = None
+            for chunk in _byte_chunks(content):
+                digest.update(chunk)
+
+        hexdigest = digest.hexdigest()
+        final = os.path.join(directory, hexdigest[:2], f'{hexdigest}{ext}')
+        full_path = self.path(final)
+        if not os.path.exists(full_path):
+            target_dir = os.path.dirname(full_path)
+            os.makedirs(target_dir, exist_ok=True)
+            if source:
+                file_move_safe(source, full_path, allow_overwrite=True)
+            else:
+                # chunks() rewinds, written next to the target and renamed
+                fd, staged = tempfile.mkstemp(dir=target_dir, prefix='.upload-')
+                try:
+                    with os.fdopen(fd, 'wb') as file:
+                        for chunk in _byte_chunks(content):
+                            file.write(chunk)
+                    os.replace(staged, full_path)
+                except BaseException:
+                    os.unlink(staged)
+                    raise
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        return final.replace('\\', '/')
+
+
+def _byte_chunks(content):
+    """ the content's chunks from the start, as bytes """
+    for chunk in content.chunks():
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def recipe_image_storage():
+    """ storage used by Recipe.image """
+    return ContentAddressedStorage()
@@ -1,10 +1,15 @@
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
 from django.core.management  import call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (SimpleTestCase,TestCase)
+
+from django.contrib.auth import get_user_model
+
+from core.models import (ImageJob,Recipe,Tag)
 
 @patch('core.management.commands.wait_for_db.Command.check')
 class CommandTest(SimpleTestCase):
@@ -32,4 +37,81 @@ class CommandTest(SimpleTestCase):
         call_command('wait_for_db')
         
         self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases = ['default']) 
\ No newline at end of file
+        patched_check.assert_called_with(databases = ['default']) 
+
+class BenchmarkCommandTest(TestCase):
+    """ test for benchmark commands """
+
+    def test_seed_recipes(self):
+        """ seeding creates recipes linked to the bench users """
+        call_command(
+            'seed_recipes', recipes=30, users=2, tags=5, links=2,
+            batch_size=10, stdout=StringIO(),
+        )
+
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertEqual(Tag.objects.count(), 10)
+        self.assertEqual(Recipe.tag.through.objects.count(), 60)
+
+    def test_benchmark_queries(self):
+        """ the benchmark prints a report for every query """
+        call_command('seed_recipes', recipes=5, users=1, tags=2, stdout=StringIO())
+        out = StringIO()
+
+        call_command('benchmark_queries', repeat=2, stdout=out)
+
+        self.assertIn('recipe_list', out.getvalue())
+        self.assertIn('p95', out.getvalue())
+
+    def test_benchmark_auth(self):
+        """ the auth benchmark reports both authentication classes """
+        out = StringIO()
+
+        call_command('benchmark_auth', requests=3, stdout=out)
+
+        # the view reads the profile on top of authenticating
+        self.assertIn('CachedTokenAuthentication: 1.', out.getvalue())
+        self.assertIn('TokenAuthentication: 2.00', out.getvalue())
+
+    def test_process_image_jobs(self):
+        """ pending jobs are run and failed ones can be retried """
+        user = get_user_model().objects.create_user('jobs@example.com', 'pass')
+        recipe = Recipe.objects.create(
+            user=user, title='no image', time_minutes=1, price='1.00',
+        )
+        job = ImageJob.objects.create(recipe=recipe)
+
+        call_command('process_image_jobs', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.FAILED)
+
+        call_command('process_image_jobs', retry_failed=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+
+    def test_recount_usage(self):
+        """ seeded counters are correct and drift is repaired """
+        call_command(
+            'seed_recipes', recipes=10, users=1, tags=3, links=2, stdout=StringIO(),
+        )
+        tag = Tag.objects.first()
+        self.assertEqual(tag.usage_count, tag.recipe_set.count())
+        Tag.objects.filter(id=tag.id).update(usage_count=99)
+
+        out = StringIO()
+        call_command('recount_usage', dry_run=True, stdout=out)
+        self.assertIn('tags: 1 drifted (dry run)', out.getvalue())
+        call_command('recount_usage', stdout=StringIO())
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.usage_count, tag.recipe_set.count())
+
+    def test_benchmark_login(self):
+        """ the login benchmark reports a rate for each hasher """
+        out = StringIO()
+
+        call_command('benchmark_login', 'argon2', 'pbkdf2', logins=2, stdout=out)
+
+        self.assertIn('argon2: ', out.getvalue())
+        self.assertIn('pbkdf2: ', out.getvalue())
+        self.assertIn('logins/s/worker', out.getvalue())
@@ -1,6 +1,7 @@
 """ test for models """
 from unittest.mock import patch
 from decimal import Decimal
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from core import models
@@ -77,6 +78,16 @@ class ModelTestCase(TestCase):
         
         self.assertEqual(str(ingredient),ingredient.name)
         
+    def test_tag_name_unique_per_user(self):
+        """ a user can not have two tags with the same name """
+        user = create_user()
+        other = create_user(email='other@example.com')
+        models.Tag.objects.create(user=user,name="tag1")
+        models.Tag.objects.create(user=other,name="tag1")
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user,name="tag1")
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name(self,mock_uuid):
         """test and genrate image path  """
@@ -0,0 +1,201 @@
+"""
+Tests for the connection pool and the postgresql backend using it.
+"""
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from psycopg2 import extensions
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import pool as pool_module
+from core.backends.postgresql.base import DatabaseWrapper
+from core.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """ the parts of a psycopg2 connection the pool uses """
+
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """ test ConnectionPool with fake connections """
+
+    def _pool(self, **kwargs):
+        kwargs.setdefault('min_size', 0)
+        kwargs.setdefault('max_size', 2)
+        kwargs.setdefault('timeout', 0.05)
+        return ConnectionPool(FakeConnection, **kwargs)
+
+    def test_opens_min_size_up_front(self):
+        pool = self._pool(min_size=2)
+
+        stats = pool.stats()
+
+        self.assertEqual((stats['size'], stats['idle'], stats['created']), (2, 2, 2))
+
+    def test_released_connection_is_reused(self):
+        pool = self._pool()
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['created'], 1)
+
+    def test_timeout_when_exhausted(self):
+        pool = self._pool(max_size=1)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_waiter_gets_released_connection(self):
+        pool = self._pool(max_size=1, timeout=5)
+        conn = pool.acquire()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+        waiter.start()
+
+        pool.release(conn)
+        waiter.join(5)
+
+        self.assertEqual(got, [conn])
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['max_wait_ms'], 0)
+
+    def test_open_transaction_rolled_back(self):
+        pool = self._pool()
+        conn = pool.acquire()
+        conn.status = extensions.TRANSACTION_STATUS_INTRANS
+
+        pool.release(conn)
+
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_broken_connection_dropped(self):
+        pool = self._pool()
+        conn = pool.acquire()
+        conn.status = extensions.TRANSACTION_STATUS_UNKNOWN
+
+        pool.release(conn)
+
+        stats = pool.stats()
+        self.assertTrue(conn.closed)
+        self.assertEqual((stats['size'], stats['discarded']), (0, 1))
+
+    def test_failed_check_replaces_connection(self):
+        pool = self._pool(check=lambda conn: not conn.stale)
+        conn = pool.acquire()
+        conn.stale = True
+        pool.release(conn)
+
+        fresh = pool.acquire()
+
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_failed_connect_frees_slot(self):
+        pool = ConnectionPool(
+            lambda: 1 / 0, min_size=0, max_size=1, timeout=0.05,
+        )
+
+        with self.assertRaises(ZeroDivisionError):
+            pool.acquire()
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_closed_pool_closes_released_connections(self):
+        pool = self._pool()
+        idle, busy = pool.acquire(), pool.acquire()
+        pool.release(idle)
+
+        pool.close()
+        pool.release(busy)
+
+        self.assertTrue(idle.closed and busy.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class DatabaseWrapperTest(SimpleTestCase):
+    """ test the health check and pool hand-off without a server """
+
+    def _wrapper(self, **settings):
+        settings_dict = {
+            'NAME': 'recipes', 'USER': '', 'PASSWORD': '', 'HOST': '',
+            'PORT': '', 'OPTIONS': {}, 'TIME_ZONE': None,
+            'AUTOCOMMIT': True, 'CONN_MAX_AGE': 60, **settings,
+        }
+        return DatabaseWrapper(settings_dict)
+
+    def test_health_check_closes_dead_connection_once(self):
+        wrapper = self._wrapper(CONN_HEALTH_CHECKS=True)
+        wrapper.connection = FakeConnection()
+
+        with patch.object(wrapper, 'is_usable', return_value=False) as is_usable:
+            wrapper.close_if_health_check_failed()
+            wrapper.close_if_health_check_failed()
+
+        is_usable.assert_called_once()
+        self.assertIsNone(wrapper.connection)
+
+    def test_health_check_disabled(self):
+        wrapper = self._wrapper()
+        wrapper.connection = FakeConnection()
+
+        with patch.object(wrapper, 'is_usable') as is_usable:
+            wrapper.close_if_health_check_failed()
+
+        is_usable.assert_not_called()
+
+    def test_close_returns_connection_to_pool(self):
+        wrapper = self._wrapper()
+        pool = ConnectionPool(FakeConnection, min_size=0)
+        wrapper.connection, wrapper.pool = pool.acquire(), pool
+
+        wrapper.close()
+
+        self.assertIsNone(wrapper.connection)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+
+class PoolStatsApiTest(TestCase):
+    """ test the admin pool stats endpoint """
+
+    def test_stats_for_admins(self):
+        pool = ConnectionPool(FakeConnection, min_size=1)
+        client = APIClient()
+        user = get_user_model().objects.create_user('test@example.com', 'pass123')
+        client.force_authenticate(user=user)
+        url = reverse('recipe:db-pool-stats')
+
+        with patch.dict(pool_module._pools, {'default': pool}, clear=True):
+            forbidden = client.get(url)
+            user.is_staff = True
+            user.save()
+            res = client.get(url)
+
+        self.assertEqual(forbidden.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['default']['idle'], 1)
@@ -0,0 +1,118 @@
+"""
+Tests for the orjson renderer and parser.
+"""
+import datetime
+import io
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core import parsers, renderers
+from core.models import Recipe, Tag
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+from recipe import views
+
+PAYLOAD = {
+    'price': Decimal('12.50'),
+    'modified_at': datetime.datetime(2022, 5, 1, 8, 30, 1, 123456, tzinfo=datetime.timezone.utc),
+    'local': datetime.datetime(2022, 5, 1, 8, 30),
+    'day': datetime.date(2022, 5, 1),
+    'time': datetime.time(8, 30),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'lazy': gettext_lazy('This field is required.'),
+    'text': 'crème brûlée \u2028 line',
+    'nested': [{'id': 1, 'tags': ()}, None, True, 1.5],
+    1: 'int key',
+}
+
+
+class ORJSONRendererTest(SimpleTestCase):
+    """ test that ORJSONRenderer renders what JSONRenderer renders """
+
+    def test_same_bytes_as_json_renderer(self):
+        self.assertEqual(
+            ORJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD),
+        )
+
+    def test_decimal_and_datetime(self):
+        ret = ORJSONRenderer().render({
+            'price': Decimal('5.00'),
+            'at': datetime.datetime(2022, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        })
+
+        self.assertEqual(ret, b'{"price":5.0,"at":"2022-01-02T03:04:05Z"}')
+
+    def test_none_renders_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_indent_falls_back_to_stdlib(self):
+        ret = ORJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+
+        self.assertEqual(ret, JSONRenderer().render({'a': 1}, 'application/json; indent=4'))
+
+    def test_without_orjson(self):
+        with patch.object(renderers, 'orjson', None):
+            ret = ORJSONRenderer().render(PAYLOAD)
+
+        self.assertEqual(ret, JSONRenderer().render(PAYLOAD))
+
+
+class ORJSONParserTest(SimpleTestCase):
+    """ test that ORJSONParser parses what JSONParser parses """
+
+    def _parse(self, body, parser=None, **context):
+        return (parser or ORJSONParser()).parse(
+            io.BytesIO(body), 'application/json', context,
+        )
+
+    def test_parse(self):
+        body = '{"title":"crème","price":"5.00","tags":[{"name":"a"}]}'.encode()
+
+        self.assertEqual(self._parse(body), self._parse(body, JSONParser()))
+
+    def test_invalid_json(self):
+        for body in (b'{"a":', b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                self._parse(body)
+
+    def test_other_encodings_and_no_orjson(self):
+        body = '{"title":"crème"}'
+        self.assertEqual(
+            self._parse(body.encode('latin-1'), encoding='latin-1'),
+            {'title': 'crème'},
+        )
+        with patch.object(parsers, 'orjson', None):
+            self.assertEqual(self._parse(body.encode()), {'title': 'crème'})
+
+
+class RecipeListRenderTest(TestCase):
+    """ test the recipe list renders the same with both renderers """
+
+    def test_recipe_list(self):
+        user = get_user_model().objects.create_user('test@example.com', 'pass123')
+        recipe = Recipe.objects.create(
+            user=user, title='Crème brûlée', time_minutes=20,
+            price=Decimal('4.50'), modified_at=timezone.now(),
+        )
+        recipe.tag.add(Tag.objects.create(user=user, name='Dessert'))
+        factory = APIRequestFactory()
+        content = []
+        for renderer in (JSONRenderer, ORJSONRenderer):
+            view = views.RecipeViewSet.as_view(
+                {'get': 'list'}, renderer_classes=[renderer],
+            )
+            request = factory.get('/')
+            force_authenticate(request, user=user)
+            content.append(view(request).render().content)
+
+        self.assertEqual(content[0], content[1])
@@ -0,0 +1,163 @@
+"""
+Tests for the read replica routing, with a SQLite file as the replica.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import routers
+from core.middleware import replica_routing_middleware
+from core.models import Tag
+from recipe.cache import bump_user_version
+
+TAG_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+
+
+@override_settings(
+    REPLICA_DATABASES=['replica'],
+    MIDDLEWARE=['core.middleware.replica_routing_middleware', *settings.MIDDLEWARE],
+)
+class ReplicaRoutingTest(TransactionTestCase):
+    """ test that reads follow the router between primary and replica """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tempdir = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.tempdir.name, 'replica.sqlite3'),
+        }
+        connections.ensure_defaults('replica')
+        connections.prepare_test_settings('replica')
+        # the router keeps migrations off replicas, build its schema directly
+        with override_settings(REPLICA_DATABASES=[]):
+            call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.tempdir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'testpassword',
+        )
+        token = Token.objects.create(user=self.user)
+        # the replica has the same user, but different tags
+        self.user.save(using='replica')
+        token.save(using='replica')
+        Tag.objects.create(user=self.user, name='Primary')
+        Tag(user=self.user, name='Replica').save(using='replica')
+        # forget the modified time from creating the tag, as if it was long ago
+        cache.clear()
+        self.requests = 0
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def tearDown(self):
+        routers._down_until.clear()
+        with override_settings(REPLICA_DATABASES=[]):
+            call_command(
+                'flush', database='replica', interactive=False, verbosity=0,
+            )
+
+    def _tag_names(self, client=None):
+        # a fresh query string each time, so no response comes from the cache
+        self.requests += 1
+        res = (client or self.client).get(TAG_URL, {'n': self.requests})
+        return [tag['name'] for tag in res.data['results']]
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self._tag_names(), ['Replica'])
+
+    def test_recent_change_pins_user_to_primary(self):
+        """ every client of a user reads the primary for a while after a change """
+        other_client = APIClient()
+        other_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.get(user=self.user).key}'
+        )
+        bump_user_version(self.user.id)
+
+        self.assertEqual(self._tag_names(), ['Primary'])
+        self.assertEqual(self._tag_names(other_client), ['Primary'])
+
+        later = time.time() + settings.READ_YOUR_WRITES_SECONDS + 2
+        with patch('core.routers.time.time', return_value=later):
+            self.assertEqual(self._tag_names(), ['Replica'])
+
+    def test_other_users_stay_on_replica(self):
+        other = get_user_model().objects.create_user('other@example.com', 'pass123')
+        bump_user_version(other.id)
+
+        self.assertEqual(self._tag_names(), ['Replica'])
+
+    def test_tokens_read_from_primary(self):
+        """ a token created at login works before it reaches the replica """
+        Token.objects.filter(user=self.user).delete()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(self._tag_names(), ['Replica'])
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        connections['replica'].close()
+        with patch.object(
+            connections['replica'], 'ensure_connection',
+            side_effect=OperationalError,
+        ) as ensure_connection:
+            self.assertEqual(self._tag_names(), ['Primary'])
+            self.assertEqual(self._tag_names(), ['Primary'])
+
+        # the failure is remembered instead of retried on every request
+        ensure_connection.assert_called_once()
+
+    def test_reads_outside_requests_use_primary(self):
+        router = routers.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Tag), 'default')
+
+        token = routers.start_request(True)
+        try:
+            self.assertEqual(router.db_for_read(Tag), 'replica')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Tag), 'default')
+        finally:
+            routers.end_request(token)
+
+    def test_no_migrations_on_replica(self):
+        router = routers.ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertIsNone(router.allow_migrate('default', 'core'))
+
+    def test_async_middleware(self):
+        """ under ASGI the middleware stays async and routes the request """
+        seen = []
+
+        async def get_response(request):
+            seen.append(routers._routing.get())
+            return 'response'
+
+        middleware = replica_routing_middleware(get_response)
+        request = type('Request', (), {'method': 'GET'})()
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertEqual(asyncio.run(middleware(request)), 'response')
+        self.assertTrue(seen[0]['replica'])
+        self.assertIsNone(routers._routing.get())
@@ -0,0 +1,138 @@
+""" test for content addressed image storage """
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import (SimpleUploadedFile,TemporaryUploadedFile)
+from django.core.management import call_command
+from django.test import (TestCase,override_settings)
+from django.utils import timezone
+
+from core.models import (ImageBlob,Recipe)
+from core.storage import ContentAddressedStorage
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class StorageTestCase(TestCase):
+    """ test deduplicated storage and reference counting """
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+        self.user = get_user_model().objects.create_user('test@example.com', 'pass')
+
+    def create_recipe(self, content=None):
+        """ create a recipe, optionally with an image of the given bytes """
+        recipe = Recipe(user=self.user, title='r', time_minutes=1, price='1.00')
+        if content is not None:
+            recipe.image = SimpleUploadedFile('photo.JPG', content)
+        recipe.save()
+        return recipe
+
+    def test_same_content_is_stored_once(self):
+        """ saving identical bytes twice returns the same name """
+        first = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'same'))
+        second = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'same'))
+        other = self.storage.save('uploads/recipe/c.jpg', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith('uploads/recipe/'))
+        self.assertTrue(first.endswith('.jpg'))
+        with self.storage.open(first) as file:
+            self.assertEqual(file.read(), b'same')
+
+    def test_existing_content_is_not_written(self):
+        """ in memory content already stored is hashed but not written """
+        first = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'dup'))
+
+        with patch('core.storage.tempfile.mkstemp') as mkstemp:
+            second = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'dup'))
+
+        self.assertEqual(first, second)
+        mkstemp.assert_not_called()
+        leftovers = [
+            name for _, _, files in os.walk(MEDIA_ROOT) for name in files
+            if name.startswith('.upload-')
+        ]
+        self.assertEqual(leftovers, [])
+
+    def test_temporary_upload_is_moved(self):
+        """ uploads spooled to disk are hashed and moved into place """
+        upload = TemporaryUploadedFile('big.png', 'image/png', 4, None)
+        upload.write(b'big!')
+        upload.seek(0)
+
+        name = self.storage.save('uploads/recipe/big.png', upload)
+
+        self.assertEqual(self.storage.size(name), 4)
+        self.assertFalse(os.path.exists(upload.temporary_file_path()))
+        upload.close()
+
+    def test_reference_counts_follow_recipes(self):
+        """ blobs count the recipes that use them """
+        first = self.create_recipe(b'shared')
+        second = self.create_recipe(b'shared')
+        self.assertEqual(first.image.name, second.image.name)
+        blob = ImageBlob.objects.get(name=first.image.name)
+        self.assertEqual(blob.ref_count, 2)
+
+        second.image = SimpleUploadedFile('new.jpg', b'replacement')
+        second.save()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+        Recipe.objects.get(id=first.id).delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+
+    def test_gc_deletes_unreferenced_files(self):
+        """ gc_images removes blobs no recipe uses and keeps the rest """
+        kept = self.create_recipe(b'kept')
+        dropped = self.create_recipe(b'dropped')
+        dropped_name = dropped.image.name
+        dropped.delete()
+
+        later = timezone.now() + timedelta(hours=2)
+        with patch('core.management.commands.gc_images.timezone.now', return_value=later):
+            call_command('gc_images', stdout=StringIO())
+
+        self.assertFalse(self.storage.exists(dropped_name))
+        self.assertFalse(ImageBlob.objects.filter(name=dropped_name).exists())
+        self.assertTrue(self.storage.exists(kept.image.name))
+
+    def test_gc_keeps_recently_released_files(self):
+        """ a blob released within the grace window is kept """
+        dropped = self.create_recipe(b'dropped')
+        dropped_name = dropped.image.name
+        dropped.delete()
+
+        call_command('gc_images', stdout=StringIO())
+
+        self.assertTrue(self.storage.exists(dropped_name))
+        self.assertEqual(ImageBlob.objects.get(name=dropped_name).ref_count, 0)
+
+    def test_gc_orphans_and_recount(self):
+        """ untracked files are removed and drifted counts are repaired """
+        recipe = self.create_recipe(b'tracked')
+        ImageBlob.objects.update(ref_count=0)
+        orphan = self.storage.save('uploads/recipe/x.jpg', ContentFile(b'orphan'))
+
+        later = self.storage.get_modified_time(orphan) + timedelta(hours=2)
+        with patch('core.management.commands.gc_images.timezone.now', return_value=later):
+            call_command('gc_images', recount=True, orphans=True, stdout=StringIO())
+
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(recipe.image.name))
+        self.assertEqual(ImageBlob.objects.get(name=recipe.image.name).ref_count, 1)
@@ -0,0 +1,92 @@
+"""
+Async execution path for the read-heavy endpoints.
+
+under ASGI, Django 3.2 runs every sync view on one shared thread
+(thread_sensitive), so a request waiting on the database blocks all the
+others. Django 3.2 has no async ORM, so GET and HEAD requests of the
+wrapped views run on a dedicated pool of ASYNC_DB_THREADS threads
+instead: the event loop only awaits the result and the pool size bounds
+how many requests, and so how many database connections, are busy at
+once. asgi.py turns this on via ASYNC_READ_VIEWS; under WSGI the plain
+sync views are kept.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+# url names served through the pool when ASYNC_READ_VIEWS is on
+ASYNC_ROUTES = ('recipe-list', 'recipe-detail', 'tag-list', 'ingredient-list')
+# only reads are offloaded, writes keep Django's usual sync path
+OFFLOAD_METHODS = ('GET', 'HEAD')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """ return the shared database pool, creating it on first use """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_THREADS,
+                thread_name_prefix='async-db',
+            )
+        return _executor
+
+
+def _run_view(view, request, args, kwargs):
+    """ run a sync view on a pool thread, like a request on a WSGI worker """
+    # pool threads see no request_started/finished, manage connections here
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            # render while the thread still holds the database connection
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def offload(view):
+    """ wrap a sync view into an async view running GET and HEAD on the pool
+
+    other methods of the same routes, e.g. creating or updating a recipe,
+    run like any sync view under ASGI.
+    """
+    sync_view = sync_to_async(view, thread_sensitive=True)
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method not in OFFLOAD_METHODS:
+            return await sync_view(request, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        # run_in_executor drops context variables, e.g. the replica routing
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            get_executor(),
+            functools.partial(context.run, _run_view, view, request, args, kwargs),
+        )
+
+    return async_view
+
+
+def offload_patterns(patterns, names=ASYNC_ROUTES):
+    """ return the url patterns with the named views wrapped by offload """
+    return [
+        URLPattern(
+            pattern.pattern, offload(pattern.callback),
+            pattern.default_args, pattern.name,
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,85 @@
+"""
+Prefix suggestions for tag and ingredient names.
+
+each worker keeps an in-process index per user and model: the names sorted
+case-insensitively with how many recipes use them. a prefix lookup is a
+binary search for the matching range plus a top-N pick by usage, so no
+query runs while the user types. indexes are tied to the per-user cache
+version, which every tag, ingredient and link change bumps, and are
+rebuilt with one query on the next lookup after a change, or once they
+are AUTOCOMPLETE_INDEX_TTL seconds old.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+
+from recipe.cache import get_user_version
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# indexes kept per worker, least recently used ones are dropped first
+MAX_INDEXES = 1024
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class PrefixIndex:
+    """ names sorted for prefix search, each with its usage count """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row[1].casefold(), row[0]))
+        self.keys = [name.casefold() for _, name, _ in rows]
+        self.rows = rows
+
+    def search(self, prefix, limit):
+        """ return up to limit (id, name, uses) rows, most used first """
+        prefix = prefix.casefold()
+        start = bisect_left(self.keys, prefix)
+        # every key starting with prefix sorts before prefix + U+10FFFF
+        end = bisect_left(self.keys, prefix + '\U0010ffff', start)
+        return heapq.nlargest(
+            limit, self.rows[start:end], key=lambda row: (row[2], -row[0]),
+        )
+
+
+def build_index(model, user_id):
+    """ load the names of a user with their usage counts """
+    rows = (
+        model.objects.filter(user_id=user_id)
+        .values_list('id', 'name', 'usage_count')
+    )
+    return PrefixIndex(rows)
+
+
+def get_index(model, user_id):
+    """ return the current index of a user, rebuilding a stale one """
+    version = get_user_version(user_id)
+    key = (model._meta.label, user_id)
+    now = time.monotonic()
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        # the ttl bounds staleness from changes that don't bump the version
+        if entry and entry[0] == version and entry[1] > now:
+            _indexes.move_to_end(key)
+            return entry[2]
+
+    index = build_index(model, user_id)
+    with _indexes_lock:
+        _indexes[key] = (version, now + settings.AUTOCOMPLETE_INDEX_TTL, index)
+        _indexes.move_to_end(key)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def suggest(model, user_id, prefix, limit=DEFAULT_LIMIT):
+    """ return the most used names of a user starting with prefix """
+    return [
+        {'id': id, 'name': name, 'uses': uses}
+        for id, name, uses in get_index(model, user_id).search(prefix, limit)
+    ]
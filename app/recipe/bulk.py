@@ -0,0 +1,275 @@
+"""
+Bulk import and export helpers for the recipe API.
+"""
+import codecs
+import csv
+import json
+import re
+import time
+
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import (Recipe,Tag,Ingredient)
+from recipe.cache import bump_user_version
+from recipe.search import update_search_vectors
+from recipe.usage import (adjust_usage,count_links)
+from recipe.serializers import (RecipeImportSerializer,get_or_create_by_name)
+
+IMPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+# largest JSON array item buffered while importing, in characters
+MAX_ITEM_SIZE = 1024 * 1024
+# decode errors this close to the end of the buffer may be a cut off item
+TRUNCATED_TAIL = 16
+EXPORT_CSV_FIELDS = [
+    'id', 'title', 'description', 'time_minutes', 'price', 'link',
+    'tag', 'ingredients',
+]
+_WHITESPACE = re.compile(r'\s*')
+_SEPARATORS = re.compile(r'[, \t\r\n]*')
+_SCALAR_END = re.compile(r'[, \t\r\n\]]')
+
+
+def iter_ndjson(stream, max_item_size=MAX_ITEM_SIZE):
+    """ yield (line, record, error) for each line of a NDJSON stream
+
+    lines are read up to max_item_size bytes; the rest of a longer line is
+    skipped and the line reported as an error.
+    """
+    line_no = 0
+    while True:
+        line = stream.readline(max_item_size + 1)
+        if not line:
+            return
+        line_no += 1
+        newline = b'\n' if isinstance(line, bytes) else '\n'
+        if len(line.rstrip(newline)) > max_item_size:
+            while line and not line.endswith(newline):
+                line = stream.readline(READ_CHUNK_SIZE)
+            yield line_no, None, {
+                'non_field_errors': [
+                    f'Line is longer than {max_item_size} bytes.'
+                ]
+            }
+            continue
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except ValueError as exc:
+            yield line_no, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+
+
+def _maybe_truncated(exc, buf):
+    """ whether a decode error may only mean the item isn't fully read yet """
+    return (
+        exc.pos >= len(buf) - TRUNCATED_TAIL
+        or exc.msg.startswith('Unterminated string')
+    )
+
+
+def iter_json_array(stream, chunk_size=READ_CHUNK_SIZE, max_item_size=MAX_ITEM_SIZE):
+    """ yield (index, record, error) for each item of a JSON array stream
+
+    the stream is read in chunks and only the unparsed tail is buffered,
+    up to max_item_size characters. A syntax error ends the stream.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+    index = 0
+    while True:
+        if not eof:
+            if len(buf) - pos > max_item_size:
+                yield index + 1, None, {
+                    'non_field_errors': [
+                        f'Item is larger than {max_item_size} characters.'
+                    ]
+                }
+                return
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            # drop the parsed part only when more is read
+            buf = buf[pos:] + text.decode(chunk or b'', final=eof)
+            pos = 0
+        while True:
+            if not started:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos == len(buf):
+                    break
+                if buf[pos] != '[':
+                    yield 1, None, {'non_field_errors': ['Expected a JSON array.']}
+                    return
+                pos += 1
+                started = True
+                continue
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if buf[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as exc:
+                if eof or not _maybe_truncated(exc, buf):
+                    yield index + 1, None, {
+                        'non_field_errors': [f'Invalid JSON: {exc}']
+                    }
+                    return
+                break
+            if (
+                not eof
+                and not isinstance(record, (dict, list))
+                and not _SCALAR_END.match(buf, end)
+                and end >= len(buf) - TRUNCATED_TAIL
+            ):
+                # a scalar at the end of the buffer may still be incomplete
+                break
+            index += 1
+            pos = end
+            yield index, record, None
+        if eof:
+            if not started:
+                return
+            yield index + 1, None, {'non_field_errors': ['Unterminated JSON array.']}
+            return
+
+
+class RecipeImporter:
+    """ validate and insert recipes for a user in batches """
+
+    def __init__(self, user, batch_size=None):
+        self.user = user
+        self.batch_size = batch_size or IMPORT_BATCH_SIZE
+        self.created = 0
+        self.errors = []
+
+    def run(self, records):
+        """ consume (line, record, error) tuples and return a summary """
+        started = time.perf_counter()
+        batch = []
+        for line, record, error in records:
+            if error is None:
+                serializer = RecipeImportSerializer(data=record)
+                if serializer.is_valid():
+                    batch.append(serializer.validated_data)
+                    if len(batch) >= self.batch_size:
+                        self._flush(batch)
+                        batch = []
+                    continue
+                error = serializer.errors
+            self.errors.append({'line': line, 'errors': error})
+        if batch:
+            self._flush(batch)
+
+        elapsed = time.perf_counter() - started
+        total = self.created + len(self.errors)
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': self.errors,
+            'elapsed_seconds': round(elapsed, 3),
+            'records_per_second': round(total / elapsed, 1) if elapsed else 0,
+        }
+
+    def _flush(self, batch):
+        """ insert a batch of validated recipes and their relations """
+        with transaction.atomic():
+            tags = get_or_create_by_name(
+                Tag, self.user,
+                (t['name'] for data in batch for t in data.get('tag', [])),
+            )
+            ingredients = get_or_create_by_name(
+                Ingredient, self.user,
+                (i['name'] for data in batch for i in data.get('ingredients', [])),
+            )
+            recipes = [
+                Recipe(
+                    user=self.user,
+                    **{k: v for k, v in data.items()
+                       if k not in ('tag', 'ingredients')}
+                )
+                for data in batch
+            ]
+            if connection.features.can_return_rows_from_bulk_insert:
+                Recipe.objects.bulk_create(recipes)
+            else:
+                for recipe in recipes:
+                    recipe.save()
+
+            tag_links = []
+            ingredient_links = []
+            for recipe, data in zip(recipes, batch):
+                for name in dict.fromkeys(t['name'] for t in data.get('tag', [])):
+                    tag_links.append(Recipe.tag.through(
+                        recipe_id=recipe.id, tag_id=tags[name].id,
+                    ))
+                for name in dict.fromkeys(
+                    i['name'] for i in data.get('ingredients', [])
+                ):
+                    ingredient_links.append(Recipe.ingredients.through(
+                        recipe_id=recipe.id, ingredient_id=ingredients[name].id,
+                    ))
+            Recipe.tag.through.objects.bulk_create(tag_links)
+            Recipe.ingredients.through.objects.bulk_create(ingredient_links)
+            adjust_usage(Tag, count_links(tag_links, Tag))
+            adjust_usage(Ingredient, count_links(ingredient_links, Ingredient))
+            update_search_vectors(pk__in=[recipe.id for recipe in recipes])
+        # bulk inserts send no signals
+        bump_user_version(self.user.id)
+        self.created += len(recipes)
+
+
+def iter_recipe_data(queryset, chunk_size=None):
+    """ yield serialized recipes reading the queryset chunk by chunk
+
+    rows come from a server-side cursor and relations are prefetched
+    for each chunk, so memory does not grow with the queryset size.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    chunk = []
+    for recipe in queryset.prefetch_related(None).iterator(chunk_size=chunk_size):
+        chunk.append(recipe)
+        if len(chunk) >= chunk_size:
+            yield from _serialize_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from _serialize_chunk(chunk)
+
+
+def _serialize_chunk(chunk):
+    """ serialize a chunk of recipes with two prefetch queries """
+    prefetch_related_objects(chunk, 'tag', 'ingredients')
+    return RecipeImportSerializer(chunk, many=True).data
+
+
+def iter_ndjson_export(queryset, chunk_size=None):
+    """ yield recipes as NDJSON lines """
+    encoder = JSONEncoder(ensure_ascii=False)
+    for data in iter_recipe_data(queryset, chunk_size):
+        yield encoder.encode(data) + '\n'
+
+
+class _Echo:
+    """ file-like object that returns what is written to it """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv_export(queryset, chunk_size=None):
+    """ yield recipes as CSV rows with tag and ingredient names joined by | """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_CSV_FIELDS)
+    for data in iter_recipe_data(queryset, chunk_size):
+        data['tag'] = '|'.join(t['name'] for t in data['tag'])
+        data['ingredients'] = '|'.join(i['name'] for i in data['ingredients'])
+        yield writer.writerow([data[field] for field in EXPORT_CSV_FIELDS])
@@ -0,0 +1,120 @@
+"""
+Per-user response caching for the recipe API.
+"""
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+KEY_PREFIX = 'recipe_api'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:version:{user_id}'
+
+
+def _modified_key(user_id):
+    return f'{KEY_PREFIX}:modified:{user_id}'
+
+
+def get_user_version(user_id):
+    """ return the cache version of a user, starting a new one if missing """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # a time based start never reuses versions of an evicted counter
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """ invalidate every cached response of a user
+
+    inside a transaction the version is bumped again once it commits, as
+    a concurrent request may cache the old rows under the first bump.
+    """
+    _bump(user_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(user_id))
+
+
+def _bump(user_id):
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+    cache.set(_modified_key(user_id), int(time.time()), timeout=None)
+
+
+def get_user_modified(user_id):
+    """ return the unix time of the last change of a user, if known """
+    return cache.get(_modified_key(user_id))
+
+
+def query_digest(request):
+    """ hash the host and the sorted query params of a request """
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    return hashlib.md5(
+        f'{request.get_host()}?{urlencode(params)}'.encode()
+    ).hexdigest()
+
+
+def response_cache_key(request, endpoint):
+    """ build a key from user, version, endpoint and sorted query params """
+    version = get_user_version(request.user.id)
+    digest = query_digest(request)
+    return f'{KEY_PREFIX}:response:{request.user.id}:{version}:{endpoint}:{digest}'
+
+
+def record(outcome):
+    """ count a cache hit or miss """
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def cache_stats():
+    """ return hit and miss counters of this process """
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 3) if total else 0
+    return stats
+
+
+class CachedListMixin:
+    """ cache list responses per user until one of their objects changes
+
+    off unless CACHE_SHARED, other workers would miss the invalidation.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not settings.CACHE_SHARED:
+            return super().list(request, *args, **kwargs)
+        key = response_cache_key(request, f'{self.basename}-list')
+        data = cache.get(key)
+        if data is not None:
+            record('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        record('misses')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RECIPE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,96 @@
+"""
+Conditional GET support for the recipe API.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.http import (http_date,parse_etags,parse_http_date_safe)
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipe.cache import (get_user_modified,get_user_version,query_digest)
+
+
+def _strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """ check If-None-Match, or If-Modified-Since when it is absent """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        if if_none_match.strip() == '*':
+            return True
+        etags = {_strip_weak(tag) for tag in parse_etags(if_none_match)}
+        return _strip_weak(etag) in etags
+    if_modified_since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE')
+    )
+    if if_modified_since is None or last_modified is None:
+        return False
+    return last_modified <= if_modified_since
+
+
+def _with_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """ answer list and retrieve with 304 when the client copy is current
+
+    list validators come from the per-user cache version and retrieve
+    validators from the object modified_at column, so a 304 is sent
+    without loading or serializing any rows. List validators need
+    CACHE_SHARED.
+    """
+
+    def _list_validators(self, request):
+        version = get_user_version(request.user.id)
+        etag = (
+            f'W/"{self.basename}-{version}-{query_digest(request)}'
+            f'-{request.accepted_renderer.format}"'
+        )
+        return etag, get_user_modified(request.user.id)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.CACHE_SHARED:
+            # the version is per worker, another one may not have bumped it
+            return super().list(request, *args, **kwargs)
+        etag, last_modified = self._list_validators(request)
+        if is_not_modified(request, etag, last_modified):
+            return _with_validators(
+                Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified,
+            )
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            _with_validators(response, etag, last_modified)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            modified_at = (
+                self.filter_queryset(self.get_queryset())
+                .filter(**{self.lookup_field: lookup})
+                .values_list('modified_at', flat=True)
+                .first()
+            )
+        except (ValueError, TypeError, ValidationError):
+            # a malformed lookup, get_object_or_404 answers it with a 404
+            modified_at = None
+        if modified_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = (
+            f'W/"{self.basename}-{lookup}-{modified_at.timestamp():.6f}'
+            f'-{request.accepted_renderer.format}"'
+        )
+        last_modified = int(modified_at.timestamp())
+        if is_not_modified(request, etag, last_modified):
+            return _with_validators(
+                Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified,
+            )
+        response = super().retrieve(request, *args, **kwargs)
+        return _with_validators(response, etag, last_modified)
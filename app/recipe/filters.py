@@ -0,0 +1,99 @@
+"""
+Queryset filters for the recipe API.
+"""
+from decimal import (Decimal,InvalidOperation)
+
+from django.db.models import (Exists,OuterRef)
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+# largest values the time_minutes and price columns hold
+MAX_TIME = 2 ** 31 - 1
+MAX_PRICE = Decimal('999.99')
+# query param: (lookup, parser, largest value)
+RANGE_FILTERS = {
+    'max_time': ('time_minutes__lte', int, MAX_TIME),
+    'min_price': ('price__gte', Decimal, MAX_PRICE),
+    'max_price': ('price__lte', Decimal, MAX_PRICE),
+}
+ORDERING_FIELDS = ('id', 'time_minutes', 'price')
+
+
+def filter_by_related(queryset, field, ids, match=MATCH_ANY):
+    """ filter recipes linked to any or all of the given related ids
+
+    uses EXISTS semi-joins on the through table instead of a join, so
+    matching rows are not duplicated and no DISTINCT is needed.
+    """
+    through = Recipe._meta.get_field(field).remote_field.through
+    target = f'{Recipe._meta.get_field(field).related_model._meta.model_name}_id'
+    ids = list(dict.fromkeys(ids))
+    if match == MATCH_ALL:
+        for related_id in ids:
+            queryset = queryset.filter(Exists(through.objects.filter(
+                recipe_id=OuterRef('pk'), **{target: related_id},
+            )))
+        return queryset
+    return queryset.filter(Exists(through.objects.filter(
+        recipe_id=OuterRef('pk'), **{f'{target}__in': ids},
+    )))
+
+
+def filter_assigned(queryset):
+    """ filter tags or ingredients that are linked to at least one recipe """
+    model = queryset.model
+    field = next(
+        f for f in Recipe._meta.many_to_many if f.related_model is model
+    )
+    return queryset.filter(Exists(field.remote_field.through.objects.filter(
+        **{f'{model._meta.model_name}_id': OuterRef('pk')}
+    )))
+
+
+def filter_by_ranges(queryset, params):
+    """ apply the max_time, min_price and max_price query params """
+    values = {}
+    errors = {}
+    for param, (_, parse, largest) in RANGE_FILTERS.items():
+        raw = params.get(param)
+        if raw in (None, ''):
+            continue
+        try:
+            value = parse(raw)
+            if isinstance(value, Decimal) and not value.is_finite():
+                raise ValueError(raw)
+        except (ValueError, InvalidOperation):
+            errors[param] = ['A valid number is required.']
+            continue
+        if value < 0:
+            errors[param] = ['Ensure this value is greater than or equal to 0.']
+        elif value > largest:
+            # out of the column range, the database would reject it
+            errors[param] = [f'Ensure this value is less than or equal to {largest}.']
+        else:
+            values[param] = value
+    low, high = values.get('min_price'), values.get('max_price')
+    if low is not None and high is not None and low > high:
+        errors['min_price'] = ['Ensure min_price is not greater than max_price.']
+    if errors:
+        raise ValidationError(errors)
+    return queryset.filter(**{
+        RANGE_FILTERS[param][0]: value for param, value in values.items()
+    })
+
+
+def parse_ordering(value):
+    """ turn an ordering param into order_by fields, id breaking ties """
+    field = value.lstrip('-')
+    if field not in ORDERING_FIELDS or value.count('-') > 1:
+        raise ValidationError({'ordering': [
+            f'Choose one of {", ".join(ORDERING_FIELDS)}, '
+            'prefixed with - for descending.'
+        ]})
+    if field == 'id':
+        return (value,)
+    descending = value.startswith('-')
+    return (value, '-id' if descending else 'id')
@@ -0,0 +1,252 @@
+"""
+Background processing of uploaded recipe images.
+"""
+import io
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from core.models import (ImageBlob,ImageJob,Recipe)
+
+logger = logging.getLogger(__name__)
+
+# name: (max width, max height, Pillow format, file extension, quality)
+VARIANTS = {
+    'thumbnail': (200, 200, 'JPEG', 'jpg', 80),
+    'medium': (800, 800, 'JPEG', 'jpg', 85),
+    'webp': (1600, 1600, 'WEBP', 'webp', 80),
+}
+# small variants included in list responses
+LIST_VARIANTS = ('thumbnail', 'medium')
+VARIANT_DIR = os.path.join('uploads', 'recipe', 'variants')
+# raised when an original is missing or can not be decoded
+IMAGE_ERRORS = (UnidentifiedImageError, OSError, SyntaxError)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(image_name, variant):
+    """ storage name of a variant derived from the original file name """
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return os.path.join(VARIANT_DIR, f'{stem}_{variant}.{VARIANTS[variant][3]}')
+
+
+def render_variant(image, variant):
+    """ return (bytes, width, height) of a resized, metadata free variant """
+    max_width, max_height, image_format, _, quality = VARIANTS[variant]
+    resized = image.copy()
+    resized.thumbnail((max_width, max_height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    # saving a fresh copy without exif or icc keeps metadata out
+    resized.save(buffer, format=image_format, quality=quality, optimize=True)
+    return buffer.getvalue(), resized.width, resized.height
+
+
+def open_image(file):
+    """ decode an image, apply its exif rotation and drop alpha and metadata """
+    with Image.open(file) as source:
+        image = ImageOps.exif_transpose(source)
+        return image.convert('RGB')
+
+
+def _stored_variant(path):
+    """ metadata of a variant that is already on disk """
+    with default_storage.open(path, 'rb') as file, Image.open(file) as image:
+        width, height = image.size
+    return {
+        'name': path,
+        'width': width,
+        'height': height,
+        'size': default_storage.size(path),
+    }
+
+
+def store_variant(path, content):
+    """ write a variant under its fixed name
+
+    jobs and lazy requests for the same image may build a variant at once.
+    default_storage.save would give the later one a suffixed name, which
+    gc_images and media.py don't know, so the file is staged next to its
+    final name and renamed over it.
+    """
+    full_path = default_storage.path(path)
+    directory = os.path.dirname(full_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, staged = tempfile.mkstemp(dir=directory, prefix='.variant-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        os.chmod(staged, default_storage.file_permissions_mode or 0o644)
+        os.replace(staged, full_path)
+    except OSError:
+        if os.path.exists(staged):
+            os.unlink(staged)
+        raise
+
+
+def build_variants(recipe, names=None):
+    """ generate variants of the recipe image and return their metadata
+
+    variant names derive from the content addressed image name, so
+    variants of an image shared by several recipes are built only once.
+    """
+    variants = {}
+    image = None
+    for name in names or VARIANTS:
+        path = variant_name(recipe.image.name, name)
+        if default_storage.exists(path):
+            variants[name] = _stored_variant(path)
+            continue
+        if image is None:
+            with recipe.image.open('rb') as file:
+                image = open_image(file)
+        content, width, height = render_variant(image, name)
+        store_variant(path, content)
+        variants[name] = {
+            'name': path,
+            'width': width,
+            'height': height,
+            'size': len(content),
+        }
+    return variants
+
+
+def ensure_variant(recipe, name):
+    """ return variant metadata, generating and storing it when missing """
+    data = recipe.image_variants.get(name)
+    if (
+        data
+        and data['name'] == variant_name(recipe.image.name, name)
+        and default_storage.exists(data['name'])
+    ):
+        # an entry of a replaced image has another name
+        return data
+    try:
+        generated = build_variants(recipe, [name])
+    except IMAGE_ERRORS:
+        # lists stop linking the lazy view, so it is not decoded again
+        _save_result(recipe.id, recipe.image.name, image_status=ImageJob.FAILED)
+        recipe.image_status = ImageJob.FAILED
+        raise
+    with transaction.atomic():
+        locked = Recipe.objects.select_for_update().get(id=recipe.id)
+        if locked.image.name != recipe.image.name:
+            # the image was replaced meanwhile, its own job builds variants
+            return generated[name]
+        locked.image_variants = {**locked.image_variants, **generated}
+        locked.save(update_fields=['image_variants', 'modified_at'])
+    recipe.image_variants = locked.image_variants
+    return generated[name]
+
+
+def retain_blob(name):
+    """ count one more recipe using a stored image """
+    if not name:
+        return
+    storage = Recipe._meta.get_field('image').storage
+    blob, _ = ImageBlob.objects.get_or_create(
+        name=name,
+        defaults={'size': storage.size(name) if storage.exists(name) else 0},
+    )
+    ImageBlob.objects.filter(id=blob.id).update(ref_count=F('ref_count') + 1)
+
+
+def release_blob(name):
+    """ count one less recipe using a stored image """
+    if name:
+        ImageBlob.objects.filter(name=name).update(
+            ref_count=F('ref_count') - 1, released_at=timezone.now(),
+        )
+
+
+def _save_result(recipe_id, source, **fields):
+    """ store processing results on the recipe unless its image changed """
+    with transaction.atomic():
+        locked = Recipe.objects.select_for_update().filter(id=recipe_id).first()
+        if locked is None or locked.image.name != source:
+            # the image was replaced, its own job reports on it
+            return False
+        for name, value in fields.items():
+            setattr(locked, name, value)
+        locked.save(update_fields=[*fields, 'modified_at'])
+    return True
+
+
+def run_job(job_id):
+    """ claim a pending job and process its recipe image """
+    claimed = ImageJob.objects.filter(
+        id=job_id, status=ImageJob.PENDING,
+    ).update(status=ImageJob.PROCESSING)
+    if not claimed:
+        return
+    job = ImageJob.objects.select_related('recipe').get(id=job_id)
+    recipe = job.recipe
+    source = recipe.image.name
+    job.attempts += 1
+    try:
+        if not recipe.image:
+            raise ValueError('recipe has no image')
+        variants = build_variants(recipe)
+    except Exception as exc:
+        logger.exception('image job %s failed', job_id)
+        job.status = ImageJob.FAILED
+        job.error = str(exc)
+        job.save(update_fields=['status', 'error', 'attempts', 'updated_at'])
+        _save_result(recipe.id, source, image_status=ImageJob.FAILED)
+        return
+
+    # files of a replaced image may be shared, gc_images removes them
+    if not _save_result(
+        recipe.id, source, image_variants=variants, image_status=ImageJob.DONE,
+    ):
+        logger.info('image of recipe %s replaced, job %s dropped', recipe.id, job_id)
+    job.status = ImageJob.DONE
+    job.error = ''
+    job.save(update_fields=['status', 'error', 'attempts', 'updated_at'])
+
+
+def _run_in_worker(job_id):
+    """ run a job on a pool thread with its own database connection """
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    """ return the shared worker pool, creating it on first use """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+        return _executor
+
+
+def enqueue_image_job(recipe):
+    """ record a job for the recipe image and run it after commit
+
+    with IMAGE_PROCESSING_WORKERS set to 0 the job runs in the request
+    once the transaction commits, which is handy for tests and debugging.
+    """
+    job = ImageJob.objects.create(recipe=recipe)
+    if settings.IMAGE_PROCESSING_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(_run_in_worker, job.id)
+        )
+    else:
+        transaction.on_commit(lambda: run_job(job.id))
+    return job
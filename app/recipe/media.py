@@ -0,0 +1,156 @@
+"""
+Serving stored recipe images.
+
+content addressed names never change meaning, so those files get a strong
+ETag from their digest and a year long immutable Cache-Control. files are
+streamed with FileResponse, which hands the open file to the server's
+wsgi.file_wrapper (sendfile), or offloaded to the front server through
+X-Accel-Redirect or X-Sendfile when MEDIA_OFFLOAD is set.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse,Http404,HttpResponse,HttpResponseNotModified)
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from core.models import Recipe
+from recipe.conditional import is_not_modified
+
+SERVED_DIR = 'uploads/recipe/'
+PARTIAL_DIR = 'uploads/recipe/partial/'
+# <sha256> for originals, <sha256>_<variant> for their variants
+CONTENT_ADDRESSED = re.compile(r'^[0-9a-f]{64}(_[a-z]+)?$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'public, max-age=3600'
+RANGE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+
+class RangeFile:
+    """ file-like object reading at most length bytes from start """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """ return (start, end) of a single byte range, None to send everything
+
+    raise ValueError when the range can not be satisfied. several ranges
+    in one header are answered with the whole file, which RFC 7233 allows.
+    """
+    match = RANGE.match(header.replace(' ', '')) if header else None
+    if not match:
+        return None
+    start, end = match['start'], match['end']
+    if not start:
+        if not end:
+            return None
+        # suffix range, the last n bytes
+        length = min(int(end), size)
+        if not length:
+            raise ValueError(header)
+        return size - length, size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _validators(name, stat):
+    """ return (etag, Cache-Control) of a stored file """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if CONTENT_ADDRESSED.match(stem):
+        return f'"{stem}"', IMMUTABLE_CACHE_CONTROL
+    return f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"', MUTABLE_CACHE_CONTROL
+
+
+def _offload(name, path, content_type):
+    """ let the front server send the file """
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_OFFLOAD == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_OFFLOAD_PREFIX + name
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """ serve a recipe image with Range, caching and conditional support """
+    # check the directories on the normalized path, so that
+    # uploads/recipe/../recipe/partial/x is not served
+    path = posixpath.normpath(path)
+    if path.startswith(('/', '..')):
+        raise Http404()
+    if not path.startswith(SERVED_DIR) or path.startswith(PARTIAL_DIR):
+        raise Http404()
+    storage = Recipe._meta.get_field('image').storage
+    try:
+        full_path = storage.path(path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404()
+    if not os.path.isfile(full_path):
+        raise Http404()
+
+    etag, cache_control = _validators(path, stat)
+    last_modified = int(stat.st_mtime)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    if is_not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_OFFLOAD:
+        response = _offload(path, full_path, content_type)
+    else:
+        response = _file_response(request, full_path, stat.st_size, etag, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _file_response(request, full_path, size, etag, content_type):
+    """ stream the file, or the requested byte range of it """
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        # without fileno the server reads through read() and honours length
+        response = FileResponse(
+            RangeFile(file, start, length), status=206, content_type=content_type,
+        )
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
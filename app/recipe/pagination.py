@@ -0,0 +1,137 @@
+"""
+Pagination classes for the recipe API.
+"""
+from base64 import b64decode
+from urllib import parse
+
+from django.core.exceptions import (FieldDoesNotExist,ValidationError)
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (CursorPagination,_reverse_ordering)
+
+
+class BaseCursorPagination(CursorPagination):
+    """ keyset pagination with a client controlled page size
+
+    DRF positions a cursor on the first ordering field only and steps over
+    ties with an offset. Here the position holds every ordering field, so
+    with a unique last field, e.g. id, pages follow (value, id) keysets
+    and never need an offset, however many rows share a value.
+    """
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(
+                self._after(queryset, current_position, reverse)
+            )
+
+        # one extra row tells whether a following page exists
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering,
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _after(self, queryset, position, reverse):
+        """ rows past a position: (a > x) or (a = x and b > y) and so on """
+        condition = Q()
+        equal = {}
+        for order, raw in zip(self.ordering, position):
+            name = order.lstrip('-')
+            try:
+                if name in queryset.query.annotations:
+                    # e.g. the search rank
+                    field = queryset.query.annotations[name].output_field
+                else:
+                    field = queryset.model._meta.get_field(name)
+                value = field.to_python(raw)
+            except (FieldDoesNotExist, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        # DRF keeps only the first p, the position has one per ordering field
+        encoded = request.query_params[self.cursor_query_param]
+        tokens = parse.parse_qs(
+            b64decode(encoded.encode('ascii')).decode('ascii'),
+            keep_blank_values=True,
+        )
+        position = tuple(tokens['p'])
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=position)
+
+    def _get_position_from_instance(self, instance, ordering):
+        fields = [order.lstrip('-') for order in ordering]
+        if isinstance(instance, dict):
+            return tuple(str(instance[field]) for field in fields)
+        return tuple(str(getattr(instance, field)) for field in fields)
+
+
+class RecipeCursorPagination(BaseCursorPagination):
+    """ paginate recipes newest first, or in the order the view asks for """
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        if hasattr(view, 'get_ordering'):
+            return view.get_ordering()
+        return super().get_ordering(request, queryset, view)
+
+
+class NameCursorPagination(BaseCursorPagination):
+    """ paginate tags and ingredients by name """
+    ordering = ('-name', 'id')
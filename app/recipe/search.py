@@ -0,0 +1,89 @@
+"""
+Ranked full-text search over recipes.
+
+on Postgres each recipe keeps a weighted tsvector of its title (A), tag and
+ingredient names (B) and description (C) in Recipe.search_vector, backed by
+a GIN index. signal handlers and bulk writers refresh it through
+update_search_vectors. other databases fall back to LIKE matching with a
+simple rank, which keeps tests on SQLite meaningful.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery,SearchRank,SearchVector)
+from django.db import connections
+from django.db.models import (Case,Exists,F,FloatField,OuterRef,Q,Subquery,Value,When)
+from django.db.models.functions import Cast
+
+from core.models import Recipe
+
+SEARCH_CONFIG = 'english'
+# fields of Recipe itself that feed the vector
+SEARCH_FIELDS = {'title', 'description'}
+# terms beyond this are ignored by the LIKE fallback
+MAX_TERMS = 8
+
+
+def _is_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def _names(field):
+    """ subquery joining the names linked to the outer recipe """
+    through = getattr(Recipe, field).through
+    target = 'tag' if field == 'tag' else 'ingredient'
+    return Subquery(
+        through.objects.filter(recipe_id=OuterRef('pk'))
+        .values('recipe_id')
+        .annotate(names=StringAgg(f'{target}__name', ' '))
+        .values('names')
+    )
+
+
+def search_vector():
+    """ expression computing the vector of a recipe from its current rows """
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_names('tag'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(_names('ingredients'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(**filters):
+    """ recompute the vector of matching recipes in a single UPDATE """
+    queryset = Recipe.objects.filter(**filters)
+    if _is_postgres(queryset):
+        queryset.update(search_vector=search_vector())
+
+
+def _like_search(queryset, text):
+    """ AND of terms matched with LIKE, ranked by where they matched """
+    tag_through = Recipe.tag.through
+    ingredient_through = Recipe.ingredients.through
+    rank = Value(0.0)
+    for term in text.split()[:MAX_TERMS]:
+        in_names = Exists(tag_through.objects.filter(
+            recipe_id=OuterRef('pk'), tag__name__icontains=term,
+        )) | Exists(ingredient_through.objects.filter(
+            recipe_id=OuterRef('pk'), ingredient__name__icontains=term,
+        ))
+        in_title = Q(title__icontains=term)
+        in_description = Q(description__icontains=term)
+        queryset = queryset.filter(in_title | in_names | in_description)
+        rank = rank + Case(
+            When(in_title, then=Value(1.0)),
+            When(in_names, then=Value(0.4)),
+            default=Value(0.1),
+            output_field=FloatField(),
+        )
+    return queryset.annotate(rank=rank)
+
+
+def search_recipes(queryset, text):
+    """ filter recipes matching text and annotate them with a rank """
+    if _is_postgres(queryset):
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        # double precision keeps the rank exact when used as a cursor
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+        )
+    return _like_search(queryset, text)
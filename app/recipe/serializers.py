@@ -1,55 +1,139 @@
+from django.core.files.storage import default_storage
+from django.urls import reverse
 from rest_framework import serializers
-from core.models import (Recipe,Tag,Ingredient)
+from core.models import (ImageJob,Recipe,Tag,Ingredient)
+from recipe.images import (LIST_VARIANTS,VARIANTS)
+
+
+def get_or_create_by_name(model, user, names):
+    """ return a name to object dict, creating missing rows in bulk """
+    names = set(names)
+    if not names:
+        return {}
+    existing = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+    missing = [
+        model(user=user, name=name)
+        for name in names if name not in existing
+    ]
+    if missing:
+        # rows created concurrently are skipped by the unique constraint
+        # and picked up by the second lookup
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+        created = model.objects.filter(
+            user=user,
+            name__in=[obj.name for obj in missing],
+        )
+        existing.update((obj.name, obj) for obj in created)
+    return existing
 
 class TagSerializer(serializers.ModelSerializer):
     """ serializers for tags """
     
     class Meta:
         model = Tag
-        fields = ['id', 'name']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'usage_count']
+        read_only_fields = ['id', 'usage_count']
 
 class IngredientSerializer(serializers.ModelSerializer):
     """ serializers for tags """
     
     class Meta:
         model = Ingredient
+        fields = ['id', 'name', 'usage_count']
+        read_only_fields = ['id', 'usage_count']
+
+class RecipeTagSerializer(TagSerializer):
+    """ tags nested in recipes, without counts that other recipes change """
+
+    class Meta(TagSerializer.Meta):
         fields = ['id', 'name']
-        read_only_fields = ['id']
-        
-class RecipeSerializer(serializers.ModelSerializer):
+
+class RecipeIngredientSerializer(IngredientSerializer):
+    """ ingredients nested in recipes, without usage counts """
+
+    class Meta(IngredientSerializer.Meta):
+        fields = ['id', 'name']
+
+
+def image_variants_data(recipe_id, image, stored, names, request=None, status=''):
+    """ describe the named variants of a recipe image, {} without an image
+
+    missing variants link the lazy view, unless processing the image failed.
+    """
+    if not image:
+        return {}
+    variants = {}
+    for name in names:
+        data = stored.get(name)
+        if not data and status == ImageJob.FAILED:
+            continue
+        if data:
+            url = default_storage.url(data['name'])
+            data = {key: data[key] for key in ('width', 'height', 'size')}
+        else:
+            url = reverse('recipe:recipe-image-variant', args=[recipe_id, name])
+            data = {'width': None, 'height': None, 'size': None}
+        variants[name] = {
+            'url': request.build_absolute_uri(url) if request else url,
+            **data,
+        }
+    return variants
+
+class ImageVariantsMixin(serializers.Serializer):
+    """ expose image variants with their size so clients can lay out early
+
+    variants that are not generated yet point at the lazy variant view.
+    """
+    image_variant_names = tuple(VARIANTS)
+    image_variants = serializers.SerializerMethodField()
+
+    def get_image_variants(self, obj):
+        return image_variants_data(
+            obj.id, obj.image, obj.image_variants, self.image_variant_names,
+            self.context.get('request'), obj.image_status,
+        )
+
+
+class RecipeSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """ serializers for Recipes """
-    tag= TagSerializer(many=True, required=False)
-    ingredients= IngredientSerializer(many=True, required=False)
+    image_variant_names = LIST_VARIANTS
+    tag= RecipeTagSerializer(many=True, required=False)
+    ingredients= RecipeIngredientSerializer(many=True, required=False)
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'time_minutes', 'price', 'link','tag','ingredients']
+        fields = [
+            'id', 'title', 'time_minutes', 'price', 'link','tag','ingredients',
+            'image_variants',
+        ]
         read_only_fields = ['id']
         
-    def _get_or_create_tag(self, tag,recipe):
+    def _get_or_create_objects(self, model, items):
+        """ resolve names to objects with one lookup and one bulk insert """
         auth_user = self.context['request'].user
-        for t in tag:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **t,
-            )
-            recipe.tag.add(tag_obj)
-    
+        names = list(dict.fromkeys(item['name'] for item in items))
+        objects = get_or_create_by_name(model, auth_user, names)
+        return [objects[name] for name in names]
+
+    def _get_or_create_tag(self, tag,recipe):
+        recipe.tag.set(self._get_or_create_objects(Tag, tag))
+
     def _get_or_create_ingredients(self, ingredients,recipe):
-        auth_user = self.context['request'].user
-        for t in ingredients:
-            ingredients_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **t,
-            )
-            recipe.ingredients.add(ingredients_obj)     
+        recipe.ingredients.set(
+            self._get_or_create_objects(Ingredient, ingredients)
+        )
+
     def create(self, validated_data):
         """Create a recipe."""
         tag = validated_data.pop('tag', [])
         ingredients= validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tag(tag,recipe)
-        self._get_or_create_ingredients(ingredients,recipe)
+        if tag:
+            self._get_or_create_tag(tag,recipe)
+        if ingredients:
+            self._get_or_create_ingredients(ingredients,recipe)
         return recipe
     
     def update(self, instance ,validated_data):
@@ -58,11 +142,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients= validated_data.pop('ingredients', None)
         
         if tag is not None:
-            instance.tag.clear()
             self._get_or_create_tag(tag,instance)
             
         if ingredients is not None:
-            instance.ingredients.clear()
             self._get_or_create_ingredients(ingredients,instance)
                 
         for attr, value in validated_data.items():
@@ -74,14 +156,27 @@ class RecipeSerializer(serializers.ModelSerializer):
   
 class RecipeDetailSerializer(RecipeSerializer):
     """ serializers for recipes details """
+    image_variant_names = tuple(VARIANTS)
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description','image'] 
+        fields = RecipeSerializer.Meta.fields + [
+            'description','image','image_status',
+        ]
+        read_only_fields = ['id','image_status']
         
 
-class ImageSerializer(serializers.ModelSerializer):
+class RecipeImportSerializer(RecipeSerializer):
+    """ serializers for validating bulk imported recipes """
+    class Meta(RecipeSerializer.Meta):
+        fields = [
+            'id', 'title', 'time_minutes', 'price', 'link','tag','ingredients',
+            'description',
+        ]
+
+
+class ImageSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """ serializers for uploading images """
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
+        fields = ['id', 'image', 'image_status', 'image_variants']
+        read_only_fields = ['id', 'image_status']
         extra_kwargs={'image':{'required':'True'}}
\ No newline at end of file
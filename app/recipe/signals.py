@@ -0,0 +1,161 @@
+"""
+Signal handlers for the recipe API.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed,post_delete,post_save,pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import (Recipe,Tag,Ingredient)
+from recipe.cache import bump_user_version
+from recipe.images import (release_blob,retain_blob)
+from recipe.search import (SEARCH_FIELDS,update_search_vectors)
+from recipe.usage import (adjust_usage,link_column,through_of)
+
+RECIPE_FIELDS = {Tag: 'tag', Ingredient: 'ingredients'}
+
+
+def touch_recipes(**filters):
+    """ mark recipes as modified when something they show has changed """
+    Recipe.objects.filter(**filters).update(modified_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_change(sender, instance, **kwargs):
+    """ invalidate cached responses of the owner of a changed object """
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_on_rename(sender, instance, created, **kwargs):
+    """ recipes embed tag and ingredient names """
+    if not created:
+        touch_recipes(**{RECIPE_FIELDS[sender]: instance})
+        update_search_vectors(**{RECIPE_FIELDS[sender]: instance})
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_on_delete(sender, instance, **kwargs):
+    """ deleting a tag or ingredient removes it from its recipes """
+    filters = {RECIPE_FIELDS[sender]: instance}
+    instance._linked_recipe_ids = list(
+        Recipe.objects.filter(**filters).values_list('id', flat=True)
+    )
+    touch_recipes(pk__in=instance._linked_recipe_ids)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def reindex_on_delete(sender, instance, **kwargs):
+    """ the deleted name no longer matches its former recipes """
+    update_search_vectors(pk__in=instance.__dict__.pop('_linked_recipe_ids', []))
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_link_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """ invalidate cached responses and touch recipes when links change """
+    if reverse and action == 'pre_clear':
+        field = RECIPE_FIELDS[type(instance)]
+        instance._cleared_recipe_ids = list(
+            Recipe.objects.filter(**{field: instance}).values_list('id', flat=True)
+        )
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', [])
+    else:
+        recipe_ids = pk_set
+    touch_recipes(pk__in=recipe_ids)
+    update_search_vectors(pk__in=recipe_ids)
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields, **kwargs):
+    """ refresh the search vector when title or description may differ """
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        update_search_vectors(pk=instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_usage(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """ keep usage counters in step with added and removed links
+
+    removals are counted before they happen, as pk_set of a remove may
+    hold rows that were never linked.
+    """
+    target = type(instance) if reverse else model
+    column = link_column(target)
+    if action == 'post_add':
+        if reverse:
+            adjust_usage(target, {instance.pk: len(pk_set)})
+        else:
+            adjust_usage(target, dict.fromkeys(pk_set, 1))
+    elif action in ('pre_remove', 'pre_clear') and reverse:
+        links = sender.objects.filter(**{column: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(recipe_id__in=pk_set)
+        instance._usage_removed = {instance.pk: -links.count()}
+    elif action in ('pre_remove', 'pre_clear'):
+        links = sender.objects.filter(recipe_id=instance.pk)
+        if action == 'pre_remove':
+            links = links.filter(**{f'{column}__in': pk_set})
+        instance._usage_removed = dict.fromkeys(
+            links.values_list(column, flat=True), -1
+        )
+    elif action in ('post_remove', 'post_clear'):
+        adjust_usage(target, instance.__dict__.pop('_usage_removed', {}))
+
+
+@receiver(pre_delete, sender=Recipe)
+def collect_usage(sender, instance, **kwargs):
+    """ remember the links a deleted recipe takes with it """
+    instance._usage_links = {
+        model: list(
+            through_of(model).objects.filter(recipe_id=instance.pk)
+            .values_list(link_column(model), flat=True)
+        )
+        for model in RECIPE_FIELDS
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def release_usage(sender, instance, **kwargs):
+    """ a deleted recipe no longer uses its tags and ingredients """
+    for model, ids in instance.__dict__.pop('_usage_links', {}).items():
+        adjust_usage(model, dict.fromkeys(ids, -1))
+
+
+@receiver(post_save, sender=Recipe)
+def count_image_references(sender, instance, **kwargs):
+    """ keep blob reference counts in step with Recipe.image """
+    loaded = getattr(instance, '_loaded_image', None) or None
+    current = instance.image.name or None
+    if loaded != current:
+        release_blob(loaded)
+        retain_blob(current)
+        instance._loaded_image = current
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image_reference(sender, instance, **kwargs):
+    """ a deleted recipe no longer uses its image """
+    release_blob(getattr(instance, '_loaded_image', None) or instance.image.name)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_new_user(sender, instance, created, **kwargs):
+    """ start new users on a fresh version in case their id is reused """
+    if created:
+        bump_user_version(instance.id)
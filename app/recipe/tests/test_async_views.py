@@ -0,0 +1,113 @@
+"""
+Tests for the async execution path.
+"""
+import asyncio
+import threading
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import (APIRequestFactory,force_authenticate)
+
+from core import routers
+from core.models import Recipe
+from recipe import views
+from recipe.async_views import (offload,offload_patterns)
+from recipe.urls import router
+
+
+class AsyncViewsTest(TransactionTestCase):
+    """ test views offloaded to the database thread pool """
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'testpassword',
+        )
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=Decimal('1.00'),
+        )
+
+    def _get(self, view, **kwargs):
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.user)
+        return view(request, **kwargs)
+
+    def test_offloaded_view_matches_sync_view(self):
+        """ the async view returns what the sync view returns """
+        view = views.RecipeViewSet.as_view({'get': 'list'})
+        threads = []
+
+        def spy(request, *args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return view(request, *args, **kwargs)
+
+        expected = self._get(view)
+        expected.render()
+        cache.clear()
+        response = self._get(async_to_sync(offload(spy)))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+        self.assertTrue(threads[0].startswith('async-db'))
+
+    def test_routing_state_reaches_pool(self):
+        """ the replica routing set by the middleware applies in the pool """
+        seen = []
+
+        def spy(request):
+            seen.append(routers._routing.get())
+            return views.RecipeViewSet.as_view({'get': 'list'})(request)
+
+        token = routers.start_request(True)
+        try:
+            self._get(async_to_sync(offload(spy)))
+        finally:
+            routers.end_request(token)
+
+        self.assertEqual(seen[0]['replica'], True)
+
+    def test_detail_through_pool(self):
+        view = async_to_sync(offload(
+            views.RecipeViewSet.as_view({'get': 'retrieve'})
+        ))
+        recipe = Recipe.objects.get()
+
+        response = self._get(view, pk=recipe.pk)
+
+        self.assertEqual(response.data['title'], 'Soup')
+
+    def test_writes_are_not_offloaded(self):
+        """ POST on an offloaded route runs outside the pool """
+        threads = []
+        view = views.RecipeViewSet.as_view({'post': 'create'})
+
+        def spy(request, *args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return view(request, *args, **kwargs)
+
+        request = self.factory.post(
+            '/', {'title': 'Stew', 'time_minutes': 30, 'price': '4.00'},
+            format='json',
+        )
+        force_authenticate(request, user=self.user)
+        response = async_to_sync(offload(spy))(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(threads[0].startswith('async-db'))
+        self.assertTrue(Recipe.objects.filter(title='Stew').exists())
+
+    def test_only_read_routes_are_wrapped(self):
+        """ list and detail routes become async, the rest stay sync """
+        patterns = {
+            pattern.name: pattern.callback
+            for pattern in offload_patterns(router.urls)
+        }
+
+        for name in ('recipe-list', 'recipe-detail', 'tag-list', 'ingredient-list'):
+            self.assertTrue(asyncio.iscoroutinefunction(patterns[name]), name)
+        for name in ('tag-detail', 'recipe-export', 'recipe-upload-image'):
+            self.assertFalse(asyncio.iscoroutinefunction(patterns[name]), name)
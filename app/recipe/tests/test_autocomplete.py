@@ -0,0 +1,130 @@
+"""
+Tests for tag and ingredient autocomplete.
+"""
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (Recipe,Tag,Ingredient)
+from recipe.autocomplete import PrefixIndex
+
+TAG_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENT_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+def create_user(email="test@example.com", password="testpassword"):
+    """ create user and return it """
+    return get_user_model().objects.create_user(email,password)
+
+def create_recipe(user, **params):
+    """ create and return a sample recipe """
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PrefixIndexTest(TestCase):
+    """ test the in-process prefix index """
+
+    def test_search(self):
+        index = PrefixIndex([
+            (1, 'Tomato', 2), (2, 'tofu', 5), (3, 'Thyme', 9), (4, 'TOAST', 2),
+        ])
+
+        self.assertEqual(
+            [name for _, name, _ in index.search('TO', 10)],
+            ['tofu', 'Tomato', 'TOAST'],
+        )
+        self.assertEqual(len(index.search('', 2)), 2)
+        self.assertEqual(index.search('x', 10), [])
+
+
+class AutocompleteApiTest(TestCase):
+    """ test the autocomplete actions """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def _use(self, tag, times):
+        for i in range(times):
+            create_recipe(self.user, title=f'{tag.name} {i}').tag.add(tag)
+
+    def test_ranked_by_usage(self):
+        """ matches come most used first and respect the limit """
+        self._use(Tag.objects.create(user=self.user, name='Vegan'), 1)
+        self._use(Tag.objects.create(user=self.user, name='vegetarian'), 3)
+        Tag.objects.create(user=self.user, name='Veggie')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 've'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(tag['name'], tag['uses']) for tag in res.data],
+            [('vegetarian', 3), ('Vegan', 1), ('Veggie', 0)],
+        )
+        res = self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 'VE', 'limit': 1})
+        self.assertEqual([tag['name'] for tag in res.data], ['vegetarian'])
+
+    def test_lookups_skip_the_database(self):
+        """ the index is built once and reused until something changes """
+        Ingredient.objects.create(user=self.user, name='salt')
+        self.client.get(INGREDIENT_AUTOCOMPLETE_URL, {'q': 's'})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(INGREDIENT_AUTOCOMPLETE_URL, {'q': 'sa'})
+
+        self.assertEqual([i['name'] for i in res.data], ['salt'])
+
+    def test_changes_invalidate(self):
+        """ new names and new links show up on the next lookup """
+        tag = Tag.objects.create(user=self.user, name='quick')
+        self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 'q'})
+
+        Tag.objects.create(user=self.user, name='quiche')
+        self._use(tag, 1)
+        res = self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 'q'})
+
+        self.assertEqual(
+            [(t['name'], t['uses']) for t in res.data],
+            [('quick', 1), ('quiche', 0)],
+        )
+
+    def test_index_expires(self):
+        """ changes that skip the cache version show up after the ttl """
+        tag = Tag.objects.create(user=self.user, name='quick')
+        self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 'q'})
+        Tag.objects.filter(id=tag.id).update(usage_count=3)
+
+        later = time.monotonic() + settings.AUTOCOMPLETE_INDEX_TTL + 1
+        with patch('recipe.autocomplete.time.monotonic', return_value=later):
+            res = self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 'q'})
+
+        self.assertEqual(res.data[0]['uses'], 3)
+
+    def test_limited_to_user(self):
+        Tag.objects.create(user=create_user(email='other@example.com'), name='vegan')
+
+        res = self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 'v'})
+
+        self.assertEqual(res.data, [])
+
+    def test_bad_limit(self):
+        res = self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 'v', 'limit': 500})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,233 @@
+"""
+Tests for bulk importing and exporting recipes.
+"""
+import csv
+import io
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (Recipe,Tag,Ingredient)
+from recipe.bulk import (iter_json_array,iter_ndjson)
+
+IMPORT_URL = reverse('recipe:recipe-import')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+def create_user(email="test@example.com", password="testpassword"):
+    """ create user and return it """
+    return get_user_model().objects.create_user(email,password)
+
+def sample_record(**params):
+    """ return a recipe record for importing """
+    record = {
+        'title': 'Imported recipe',
+        'time_minutes': 10,
+        'price': '5.00',
+    }
+    record.update(params)
+    return record
+
+
+class StreamReaderTest(TestCase):
+    """ test the streaming record readers """
+
+    def test_ndjson_reports_bad_lines(self):
+        """ invalid lines are reported with their line number """
+        body = b'{"a": 1}\n\nnot json\n{"b": 2}\n'
+        records = list(iter_ndjson(io.BytesIO(body)))
+
+        self.assertEqual([r[0] for r in records], [1, 3, 4])
+        self.assertEqual(records[0][1], {'a': 1})
+        self.assertIsNotNone(records[1][2])
+        self.assertEqual(records[2][1], {'b': 2})
+
+    def test_ndjson_long_line_skipped(self):
+        """ a line over the size limit is reported without buffering it """
+        body = b'{"a": 1}\n' + b'x' * 100 + b'\n{"b": 2}\n'
+        records = list(iter_ndjson(io.BytesIO(body), max_item_size=10))
+
+        self.assertEqual([r[0] for r in records], [1, 2, 3])
+        self.assertIn('longer than 10', records[1][2]['non_field_errors'][0])
+        self.assertEqual(records[2][1], {'b': 2})
+
+    def test_json_array_read_in_small_chunks(self):
+        """ array items split across chunks are decoded """
+        items = [{'title': f'recipe {i}', 'n': i * 1000} for i in range(20)]
+        body = json.dumps(items).encode()
+        records = list(iter_json_array(io.BytesIO(body), chunk_size=7))
+
+        self.assertEqual([r[1] for r in records], items)
+        self.assertTrue(all(r[2] is None for r in records))
+
+    def test_json_array_unterminated(self):
+        """ a truncated array reports an error """
+        records = list(iter_json_array(io.BytesIO(b'[{"a": 1}, {"b"')))
+
+        self.assertEqual(records[0][1], {'a': 1})
+        self.assertIsNotNone(records[-1][2])
+
+
+    def test_json_array_syntax_error_stops_reading(self):
+        """ a syntax error ends the stream instead of buffering the rest """
+        body = io.BytesIO(b'[{"a": 1}, {"b" 2}, ' + b'{"c": 3}, ' * 10000 + b']')
+        records = list(iter_json_array(body, chunk_size=64))
+
+        self.assertEqual(records[0][1], {'a': 1})
+        self.assertEqual(len(records), 2)
+        self.assertIn('Invalid JSON', records[1][2]['non_field_errors'][0])
+        self.assertLess(body.tell(), 1024)
+
+    def test_json_array_item_size_is_capped(self):
+        """ an item larger than max_item_size is reported, not buffered """
+        body = json.dumps([{'a': 1}, {'b': 'x' * 1000}, {'c': 3}]).encode()
+        records = list(iter_json_array(
+            io.BytesIO(body), chunk_size=16, max_item_size=100,
+        ))
+
+        self.assertEqual(records[0][1], {'a': 1})
+        self.assertEqual(len(records), 2)
+        self.assertIsNotNone(records[1][2])
+
+class BulkImportTest(TestCase):
+    """ test the bulk import endpoint """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_import_ndjson(self):
+        """ recipes, tags and ingredients are created from NDJSON """
+        Tag.objects.create(user=self.user, name='vegan')
+        lines = [
+            sample_record(title='one', tag=[{'name': 'vegan'}, {'name': 'quick'}]),
+            sample_record(title='two', ingredients=[{'name': 'rice'}]),
+            sample_record(title='three', tag=[{'name': 'quick'}]),
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines)
+        res = self.client.post(
+            IMPORT_URL, body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 3)
+        self.assertEqual(res.data['failed'], 0)
+        self.assertIn('records_per_second', res.data)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        one = Recipe.objects.get(title='one')
+        self.assertEqual(
+            sorted(one.tag.values_list('name', flat=True)), ['quick', 'vegan']
+        )
+        two = Recipe.objects.get(title='two')
+        self.assertEqual(
+            list(two.ingredients.values_list('name', flat=True)), ['rice']
+        )
+        self.assertEqual(Ingredient.objects.get().user, self.user)
+
+    def test_import_json_array_with_errors(self):
+        """ invalid records are reported per line and others are kept """
+        records = [
+            sample_record(title='good'),
+            sample_record(time_minutes='soon'),
+            sample_record(title='also good'),
+        ]
+        res = self.client.post(
+            IMPORT_URL, json.dumps(records), content_type='application/json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 1)
+        self.assertEqual(res.data['errors'][0]['line'], 2)
+        self.assertIn('time_minutes', res.data['errors'][0]['errors'])
+
+    def test_import_in_batches(self):
+        """ records are inserted across several batches """
+        body = '\n'.join(
+            json.dumps(sample_record(title=f'recipe {i}', tag=[{'name': 'x'}]))
+            for i in range(12)
+        )
+        with patch('recipe.bulk.IMPORT_BATCH_SIZE', 5):
+            res = self.client.post(
+                IMPORT_URL, body, content_type='application/x-ndjson'
+            )
+
+        self.assertEqual(res.data['created'], 12)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Recipe.tag.through.objects.count(), 12)
+        self.assertEqual(Tag.objects.get(user=self.user).usage_count, 12)
+
+    def test_import_unsupported_media_type(self):
+        """ only JSON bodies are accepted """
+        res = self.client.post(IMPORT_URL, 'a,b', content_type='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+
+class BulkExportTest(TestCase):
+    """ test the streaming export endpoint """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+        other = create_user(email='other@example.com')
+        Recipe.objects.create(user=other, title='hidden', time_minutes=1, price='1.00')
+        salt = Ingredient.objects.create(user=self.user, name='salt')
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'recipe {i}', time_minutes=i, price='2.50',
+            )
+            recipe.tag.add(Tag.objects.create(user=self.user, name=f'tag {i}'))
+            recipe.ingredients.add(salt)
+
+    def test_export_ndjson(self):
+        """ all recipes of the user are streamed as NDJSON """
+        with patch('recipe.bulk.EXPORT_CHUNK_SIZE', 2):
+            res = self.client.get(EXPORT_URL)
+            body = b''.join(res.streaming_content).decode()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [r['title'] for r in records], [f'recipe {i}' for i in range(4, -1, -1)]
+        )
+        self.assertEqual(records[0]['tag'][0]['name'], 'tag 4')
+        self.assertEqual(records[0]['ingredients'][0]['name'], 'salt')
+        self.assertEqual(records[0]['price'], '2.50')
+
+    def test_export_csv(self):
+        """ recipes can be exported as CSV """
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+        body = b''.join(res.streaming_content).decode()
+
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['tag'], 'tag 4')
+
+    def test_export_round_trips_through_import(self):
+        """ exported NDJSON can be imported again """
+        res = self.client.get(EXPORT_URL)
+        body = b''.join(res.streaming_content)
+        new_user = create_user(email='new@example.com')
+        self.client.force_authenticate(user=new_user)
+
+        res = self.client.post(IMPORT_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.data['created'], 5)
+        self.assertEqual(Tag.objects.filter(user=new_user).count(), 5)
+
+    def test_export_bad_format(self):
+        """ unknown export formats are rejected """
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,145 @@
+"""
+Tests for the per-user response cache.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import (TestCase,override_settings)
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (Recipe,Tag)
+from recipe.cache import cache_stats
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+STATS_URL = reverse('recipe:cache-stats')
+
+def create_user(email="test@example.com", password="testpassword"):
+    """ create user and return it """
+    return get_user_model().objects.create_user(email,password)
+
+def create_recipe(user, **params):
+    """ create and return a sample recipe """
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+# one test process shares its LocMemCache
+@override_settings(CACHE_SHARED=True)
+class ResponseCacheTest(TestCase):
+    """ test caching of list responses """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_second_request_is_a_hit(self):
+        """ a repeated list request is served from the cache """
+        create_recipe(self.user)
+        first = self.client.get(RECIPE_URL)
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPE_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+
+    def test_query_params_are_normalized(self):
+        """ param order does not matter but values do """
+        self.client.get(RECIPE_URL, {'page_size': 5, 'match': 'any'})
+
+        res = self.client.get(f'{RECIPE_URL}?match=any&page_size=5')
+        self.assertEqual(res['X-Cache'], 'HIT')
+        res = self.client.get(RECIPE_URL, {'page_size': 6, 'match': 'any'})
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_write_invalidates(self):
+        """ creating a recipe through the API invalidates the list """
+        self.client.get(RECIPE_URL)
+        self.client.post(
+            RECIPE_URL,
+            {'title': 'new', 'time_minutes': 5, 'price': '1.00'},
+        )
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_link_change_invalidates(self):
+        """ adding a tag to a recipe invalidates cached lists """
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        self.client.get(TAG_URL, {'assigned_only': 1})
+
+        recipe.tag.add(tag)
+        res = self.client.get(TAG_URL, {'assigned_only': 1})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_commit_invalidates_again(self):
+        """ a list cached while the write is uncommitted is dropped on commit """
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.user)
+            # another request reading before the commit
+            self.client.get(RECIPE_URL)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_users_do_not_share_entries(self):
+        """ cached responses are kept per user """
+        create_recipe(self.user)
+        self.client.get(RECIPE_URL)
+        other = create_user(email='other@example.com')
+        self.client.force_authenticate(user=other)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_stats(self):
+        """ hits and misses are counted and exposed to admins """
+        before = cache_stats()
+        self.client.get(TAG_URL)
+        self.client.get(TAG_URL)
+        after = cache_stats()
+        self.assertEqual(after['hits'], before['hits'] + 1)
+        self.assertEqual(after['misses'], before['misses'] + 1)
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_ratio', res.data)
+
+
+class UnsharedCacheTest(TestCase):
+    """ test the response cache stays off with a per-process cache """
+
+    def test_not_cached(self):
+        client = APIClient()
+        client.force_authenticate(user=create_user())
+        client.get(RECIPE_URL)
+
+        res = client.get(RECIPE_URL)
+
+        self.assertNotIn('X-Cache', res)
+        self.assertNotIn('ETag', res)
@@ -0,0 +1,129 @@
+"""
+Tests for ETag and conditional GET support.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import (TestCase,override_settings)
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (Recipe,Tag)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+
+def detail_url(recipe_id):
+    """ create and return recipe details url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+def create_user(email="test@example.com", password="testpassword"):
+    """ create user and return it """
+    return get_user_model().objects.create_user(email,password)
+
+def create_recipe(user, **params):
+    """ create and return a sample recipe """
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+# one test process shares its LocMemCache
+@override_settings(CACHE_SHARED=True)
+class ConditionalGetTest(TestCase):
+    """ test ETag and Last-Modified validators """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+        self.recipe = create_recipe(self.user)
+
+    def test_detail_not_modified(self):
+        """ a matching ETag returns 304 with a single query """
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=res['ETag'],
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.content)
+
+    def test_detail_malformed_id(self):
+        """ a lookup that isn't a recipe id is a 404, not a server error """
+        res = self.client.get(detail_url('not-a-number'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_changes_after_tag_added(self):
+        """ adding a tag gives the recipe a new ETag """
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        self.recipe.tag.add(Tag.objects.create(user=self.user, name='vegan'))
+
+        res = self.client.get(detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_detail_changes_after_tag_rename(self):
+        """ renaming a tag changes the ETag of its recipes """
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        self.recipe.tag.add(tag)
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        tag.name = 'vegetarian'
+        tag.save()
+
+        res = self.client.get(detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_if_modified_since(self):
+        """ If-Modified-Since is used when no ETag is sent """
+        last_modified = self.client.get(detail_url(self.recipe.id))['Last-Modified']
+
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_not_modified_without_queries(self):
+        """ list ETags come from the user version and skip the database """
+        etag = self.client.get(TAG_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_changes_after_write(self):
+        """ any change of the user gives lists a new ETag """
+        etag = self.client.get(RECIPE_URL)['ETag']
+        create_recipe(self.user, title='second')
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_list_etag_depends_on_params(self):
+        """ different query params do not share an ETag """
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        res = self.client.get(
+            RECIPE_URL, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -54,7 +54,7 @@ class PrivateTestIngredient(TestCase):
         serializers = IngredientSerializer(ingredients,many=True)
         
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(res.data,serializers.data)
+        self.assertEqual(res.data['results'],serializers.data)
         
     def test_limited_ingredients(self):
         """ test ingredientss are shown for the user that created that ingredients """
@@ -66,9 +66,9 @@ class PrivateTestIngredient(TestCase):
         res = self.client.get(INGREDIENT_URL)
         
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(len(res.data),1)
-        self.assertEqual(res.data[0]['name'],ingredients2.name)
-        self.assertEqual(res.data[0]['id'],ingredients2.id)
+        self.assertEqual(len(res.data['results']),1)
+        self.assertEqual(res.data['results'][0]['name'],ingredients2.name)
+        self.assertEqual(res.data['results'][0]['id'],ingredients2.id)
     
     def test_update_ingredient(self):
         """ test for updating a ingredient """
@@ -105,10 +105,11 @@ class PrivateTestIngredient(TestCase):
 
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
+        in1.refresh_from_db()
         s1 = IngredientSerializer(in1)
         s2 = IngredientSerializer(in2)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filtered_ingredients_unique(self):
         """Test filtered ingredients returns a unique list."""
@@ -131,4 +132,4 @@ class PrivateTestIngredient(TestCase):
 
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data['results']), 1)
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Tests for the fast recipe list path.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import views
+
+
+class FastListTest(TestCase):
+    """ test the fast list renders what RecipeSerializer renders """
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'testpassword',
+        )
+        self.tags = tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dinner', 'Quick')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Salt', 'Kale', 'Rice')
+        ]
+        for number, price in enumerate(('5.00', '0.50', '12.25', '999.99', '5.00')):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Crème soup {number}',
+                time_minutes=10 + number, price=Decimal(price),
+                link='' if number % 2 else f'https://example.com/{number}',
+                description='hearty',
+            )
+            # linked out of id order
+            recipe.tag.add(*reversed(tags[:number]))
+            recipe.ingredients.add(*ingredients[number % 3:])
+        Recipe.objects.filter(title='Crème soup 1').update(
+            image='uploads/recipe/soup.jpg',
+            image_variants={'thumbnail': {
+                'name': 'uploads/recipe/variants/soup-thumbnail.jpg',
+                'width': 200, 'height': 150, 'size': 1234,
+            }},
+        )
+
+    def _content(self, fast_list, query=''):
+        view = views.RecipeViewSet.as_view({'get': 'list'}, fast_list=fast_list)
+        request = self.factory.get(f'/api/recipe/recipes/{query}')
+        force_authenticate(request, user=self.user)
+        cache.clear()
+        return view(request).render().content
+
+    def test_same_bytes_as_serializer(self):
+        for query in (
+            '', '?page_size=2', '?ordering=price', '?ordering=-time_minutes',
+            '?search=soup', '?max_price=10&ordering=-price',
+            f'?tag={self.tags[0].id},{self.tags[2].id}',
+        ):
+            with self.subTest(query=query):
+                content = self._content(True, query)
+                self.assertIn(b'"results":[{', content)
+                self.assertEqual(content, self._content(False, query))
+
+    def test_next_page_same_bytes(self):
+        """ the cursor in the next link works the same on both paths """
+        first = views.RecipeViewSet.as_view({'get': 'list'})
+        request = self.factory.get('/api/recipe/recipes/?ordering=price&page_size=2')
+        force_authenticate(request, user=self.user)
+        next_link = first(request).data['next']
+        query = next_link[next_link.index('?'):]
+        self.assertIn('cursor=', query)
+
+        self.assertEqual(self._content(True, query), self._content(False, query))
+
+    def test_queries(self):
+        """ one query for the page and one per relation """
+        with self.assertNumQueries(3):
+            content = self._content(True)
+
+        self.assertIn(b'soup-thumbnail.jpg', content)
@@ -0,0 +1,134 @@
+"""
+Tests for serving stored recipe images.
+"""
+import os
+
+from django.core.files.base import ContentFile
+from django.test import (TestCase,override_settings)
+from django.urls import reverse
+
+from rest_framework import status
+
+from core.models import Recipe
+from recipe.media import (IMMUTABLE_CACHE_CONTROL,parse_range)
+
+
+def media_url(name):
+    """ create and return the url serving a stored file """
+    return reverse('media', args=[name])
+
+
+class ParseRangeTest(TestCase):
+    """ test the Range header parser """
+
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=50-500', 100), (50, 99))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range(None, 100))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=100-', 100)
+
+
+class ServeMediaTest(TestCase):
+    """ test the media view """
+
+    def setUp(self):
+        self.storage = Recipe._meta.get_field('image').storage
+        self.content = bytes(range(256)) * 4
+        self.name = self.storage.save(
+            'uploads/recipe/photo.jpg', ContentFile(self.content),
+        )
+        self.url = media_url(self.name)
+
+    def tearDown(self):
+        self.storage.delete(self.name)
+
+    def test_serve_whole_file(self):
+        """ content addressed files are immutable with a digest ETag """
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(res.streaming_content), self.content)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(self.content)))
+        self.assertEqual(res['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn(res['ETag'].strip('"'), self.name)
+
+    def test_range(self):
+        """ a byte range is answered with 206 and only those bytes """
+        res = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(res.streaming_content), self.content[10:20])
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(
+            res['Content-Range'], f'bytes 10-19/{len(self.content)}',
+        )
+
+    def test_unsatisfiable_range(self):
+        res = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        )
+        self.assertEqual(res['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_stale_if_range_sends_everything(self):
+        """ a range for an older version of the file is ignored """
+        res = self.client.get(
+            self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"old"',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+    @override_settings(
+        MEDIA_OFFLOAD='x-accel-redirect', MEDIA_OFFLOAD_PREFIX='/protected/',
+    )
+    def test_x_accel_redirect(self):
+        res = self.client.get(self.url)
+
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected/{self.name}')
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_OFFLOAD='x-sendfile')
+    def test_x_sendfile(self):
+        res = self.client.get(self.url)
+
+        self.assertEqual(res['X-Sendfile'], self.storage.path(self.name))
+
+    def test_only_recipe_images_are_served(self):
+        """ other paths, partial uploads and traversal return 404 """
+        partial = self.storage.save(
+            'uploads/recipe/partial/x', ContentFile(b'partial'),
+        )
+        # the storage puts it in a digest directory, remove that too
+        self.addCleanup(os.rmdir, os.path.dirname(self.storage.path(partial)))
+        self.addCleanup(self.storage.delete, partial)
+        for name in (
+            'uploads/other.jpg',
+            partial,
+            partial.replace('uploads/recipe/', 'uploads/recipe/../recipe/'),
+            partial.replace('uploads/recipe/', 'uploads/recipe/./'),
+            'uploads/recipe/../../etc/passwd',
+            f'../{self.name}',
+            'uploads/recipe/missing.jpg',
+        ):
+            res = self.client.get(media_url(name))
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND, name)
+
+    def test_write_methods_not_allowed(self):
+        res = self.client.post(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -1,15 +1,23 @@
-from django.test import TestCase
+from django.test import (TestCase,override_settings)
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 import os
+from io import BytesIO
+from unittest.mock import patch
 import tempfile
 from PIL import Image
 from rest_framework.test import APIClient
 from rest_framework import status
 
 from decimal import Decimal
-from core.models import (Recipe,Tag,Ingredient)
+from core.models import (ImageJob,Recipe,Tag,Ingredient)
 from recipe.serializers import (RecipeSerializer, RecipeDetailSerializer)
+from recipe.pagination import RecipeCursorPagination
+from recipe.images import (build_variants,enqueue_image_job,variant_name)
 
 RECIPE_URL = reverse('recipe:recipe-list')
 
@@ -32,6 +40,10 @@ def create_user( **params):
     """ create and return new user """
     return get_user_model().objects.create_user(**params)
 
+def image_variant_url(recipe_id, variant):
+    """ create and return the lazy image variant url """
+    return reverse('recipe:recipe-image-variant', args=[recipe_id, variant])
+
 def image_upload_url(recipe_id):
     """ create and return image upload url """
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
@@ -71,7 +83,7 @@ class PrivateRecipeTest(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         
     def test_recipe_for_limited_user(self):
         """ each user just access to their recipe """
@@ -89,7 +101,7 @@ class PrivateRecipeTest(TestCase):
         serializers = RecipeSerializer(recipes,many=True)
         
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(res.data,serializers.data)
+        self.assertEqual(res.data['results'],serializers.data)
     
     def test_recipe_detail(self):
         """ test for get recipe detail by id"""
@@ -377,9 +389,9 @@ class PrivateRecipeTest(TestCase):
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         """Test filtering recipes by ingredients."""
@@ -397,10 +409,232 @@ class PrivateRecipeTest(TestCase):
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
-        
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+        
+    def _create_tagged_recipes(self, count):
+        """ create recipes that each have a tag and an ingredient """
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'recipe {i}')
+            recipe.tag.add(
+                Tag.objects.create(user=self.user, name=f'tag {recipe.id}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'ingredient {recipe.id}')
+            )
+
+    def test_list_query_count_is_constant(self):
+        """ listing recipes does not run extra queries per recipe """
+        self._create_tagged_recipes(2)
+        with CaptureQueriesContext(connection) as few:
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self._create_tagged_recipes(10)
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(few), len(many))
+
+    def test_detail_query_count_is_constant(self):
+        """ retrieving a recipe does not depend on its tag count """
+        recipe = create_recipe(user=self.user)
+        recipe.tag.add(Tag.objects.create(user=self.user, name='one'))
+        url = detail_url(recipe.id)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+
+        for i in range(10):
+            recipe.tag.add(Tag.objects.create(user=self.user, name=f'tag {i}'))
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tag']), 11)
+        self.assertEqual(len(few), len(many))
+
+    def test_list_is_paginated_by_cursor(self):
+        """ recipes are returned in pages linked by cursors """
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+        ids = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(ids, sorted([r.id for r in recipes], reverse=True))
+
+    def test_page_size_is_capped(self):
+        """ clients can not ask for more than the max page size """
+        for _ in range(3):
+            create_recipe(user=self.user)
+
+        with patch.object(RecipeCursorPagination, 'max_page_size', 2):
+            res = self.client.get(RECIPE_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def _recipe_payload(self, count):
+        """ payload with the given number of tags and ingredients """
+        return {
+            'title': 'Big recipe',
+            'time_minutes': 30,
+            'price': Decimal('2.50'),
+            'tag': [{'name': f'tag {i}'} for i in range(count)],
+            'ingredients': [{'name': f'ingredient {i}'} for i in range(count)],
+        }
+
+    def test_create_query_count_is_constant(self):
+        """ creating a recipe does not run queries per tag or ingredient """
+        with CaptureQueriesContext(connection) as few:
+            res = self.client.post(RECIPE_URL, self._recipe_payload(2), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        Tag.objects.all().delete()
+        Ingredient.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.post(RECIPE_URL, self._recipe_payload(30), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tag.count(), 30)
+        self.assertEqual(recipe.ingredients.count(), 30)
+        self.assertEqual(len(few), len(many))
+
+    def test_update_keeps_unchanged_tag_links(self):
+        """ updating tags only inserts and deletes the changed links """
+        recipe = create_recipe(user=self.user)
+        keep = Tag.objects.create(user=self.user, name='keep')
+        drop = Tag.objects.create(user=self.user, name='drop')
+        recipe.tag.add(keep, drop)
+        through = Recipe.tag.through
+        keep_link = through.objects.get(recipe=recipe, tag=keep)
+
+        payload = {'tag': [{'name': 'keep'}, {'name': 'new'}, {'name': 'new'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(recipe.tag.values_list('name', flat=True)), ['keep', 'new']
+        )
+        self.assertTrue(through.objects.filter(id=keep_link.id).exists())
+        self.assertEqual(Tag.objects.filter(user=self.user, name='new').count(), 1)
+
+    def test_filter_by_tags_no_duplicates(self):
+        """ a recipe matching several tags is returned once """
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+        recipe.tag.add(tag1, tag2)
+
+        res = self.client.get(RECIPE_URL, {'tag': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual([r['id'] for r in res.data['results']], [recipe.id])
+
+    def test_filter_match_all_tags(self):
+        """ match=all only returns recipes that have every tag """
+        r1 = create_recipe(user=self.user, title='both')
+        r2 = create_recipe(user=self.user, title='one')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+        r1.tag.add(tag1, tag2)
+        r2.tag.add(tag1)
+        params = {'tag': f'{tag1.id},{tag2.id}'}
+
+        res_any = self.client.get(RECIPE_URL, params)
+        res_all = self.client.get(RECIPE_URL, {**params, 'match': 'all'})
+
+        self.assertEqual(
+            [r['id'] for r in res_any.data['results']], [r2.id, r1.id]
+        )
+        self.assertEqual([r['id'] for r in res_all.data['results']], [r1.id])
+
+    def test_filter_bad_match(self):
+        """ unknown match modes are rejected """
+        res = self.client.get(RECIPE_URL, {'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_time_and_price(self):
+        """ range params keep recipes inside the bounds """
+        quick_cheap = create_recipe(user=self.user, time_minutes=20, price=Decimal('8.00'))
+        create_recipe(user=self.user, time_minutes=45, price=Decimal('8.00'))
+        create_recipe(user=self.user, time_minutes=20, price=Decimal('12.00'))
+        create_recipe(user=self.user, time_minutes=20, price=Decimal('1.00'))
+
+        res = self.client.get(
+            RECIPE_URL, {'max_time': 30, 'min_price': '2', 'max_price': '10'},
+        )
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [quick_cheap.id]
+        )
+
+    def test_filter_bad_ranges(self):
+        """ invalid, negative and inverted bounds are rejected """
+        for params in (
+            {'max_time': 'soon'},
+            {'max_price': 'NaN'},
+            {'min_price': '-1'},
+            {'min_price': '10', 'max_price': '5'},
+            {'max_time': '9' * 30},
+            {'max_price': '1e30'},
+        ):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_ordering_pages_by_cursor(self):
+        """ ordering by price pages through every recipe once, ties by id """
+        prices = ['3.00', '1.00', '2.00', '1.00', '3.00']
+        recipes = [
+            create_recipe(user=self.user, price=Decimal(price)) for price in prices
+        ]
+
+        res = self.client.get(RECIPE_URL, {'ordering': 'price', 'page_size': 2})
+        ids = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [r['id'] for r in res.data['results']]
+
+        expected = sorted(recipes, key=lambda r: (Decimal(r.price), r.id))
+        self.assertEqual(ids, [r.id for r in expected])
+
+    def test_ordering_pages_through_ties(self):
+        """ pages follow (value, id) when more rows tie than fit a page """
+        recipes = [create_recipe(user=self.user, time_minutes=5) for _ in range(5)]
+        recipes.append(create_recipe(user=self.user, time_minutes=1))
+
+        res = self.client.get(RECIPE_URL, {'ordering': '-time_minutes', 'page_size': 2})
+        ids = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [r['id'] for r in res.data['results']]
+        back = []
+        while res.data['previous']:
+            res = self.client.get(res.data['previous'])
+            back = [r['id'] for r in res.data['results']] + back
+
+        expected = sorted(recipes, key=lambda r: (-r.time_minutes, -r.id))
+        self.assertEqual(ids, [r.id for r in expected])
+        self.assertEqual(back, ids[:len(back)])
+
+    def test_bad_cursor_not_found(self):
+        """ a cursor whose position does not fit the ordering is a 404 """
+        res = self.client.get(RECIPE_URL, {'ordering': 'price', 'cursor': 'cD1h'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ordering_is_whitelisted(self):
+        res = self.client.get(RECIPE_URL, {'ordering': 'user__password'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 class ImageUploadTestCase(TestCase):
     """ all test for upload image for recipe API """
     def setUp(self):
@@ -413,6 +647,9 @@ class ImageUploadTestCase(TestCase):
         self.recipe = create_recipe(self.user)
     
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        for data in self.recipe.image_variants.values():
+            default_storage.delete(data['name'])
         self.recipe.image.delete()
     def test_upload_image(self):
         """Test uploading an image to a recipe."""
@@ -425,8 +662,9 @@ class ImageUploadTestCase(TestCase):
             res = self.client.post(url, payload, format='multipart')
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], 'pending')
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
     def test_upload_image_bad_request(self):
@@ -435,4 +673,211 @@ class ImageUploadTestCase(TestCase):
         payload = {'image': 'notanimage'}
         res = self.client.post(url, payload, format='multipart')
 
-        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=0)
+    def test_upload_image_builds_variants(self):
+        """ the job resizes the image into variants without metadata """
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img = Image.new('RGB', (1000, 500))
+            exif = Image.Exif()
+            exif[0x010F] = 'camera maker'
+            img.save(image_file, format='JPEG', exif=exif)
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, {'image': image_file}, format='multipart')
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['image_status'], 'done')
+        self.assertEqual(
+            set(res.data['image_variants']), {'thumbnail', 'medium', 'webp'}
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(ImageJob.objects.get(recipe=self.recipe).status, 'done')
+        thumbnail = self.recipe.image_variants['thumbnail']
+        self.assertEqual((thumbnail['width'], thumbnail['height']), (200, 100))
+        with Image.open(default_storage.path(thumbnail['name'])) as variant:
+            self.assertFalse(variant.getexif())
+
+    def _upload(self, color):
+        """ post a new image to the recipe, return the response """
+        buffer = BytesIO()
+        Image.new('RGB', (300, 300), color).save(buffer, format='JPEG')
+        image = SimpleUploadedFile('photo.jpg', buffer.getvalue())
+        return self.client.post(
+            image_upload_url(self.recipe.id), {'image': image}, format='multipart',
+        )
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=0)
+    def test_reupload_drops_old_variants(self):
+        """ until its job runs a new image shows no variants of the old one """
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload('red')
+        self.recipe.refresh_from_db()
+        old_variants = self.recipe.image_variants
+        self.addCleanup(default_storage.delete, self.recipe.image.name)
+        for data in old_variants.values():
+            self.addCleanup(default_storage.delete, data['name'])
+
+        # the job of the second upload does not run
+        res = self._upload('blue')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+        self.assertEqual(res.data['image_status'], 'pending')
+        res = self.client.get(detail_url(self.recipe.id))
+        urls = [data['url'] for data in res.data['image_variants'].values()]
+        for data in old_variants.values():
+            self.assertFalse(any(url.endswith(data['name']) for url in urls))
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=0)
+    def test_broken_image_job_fails(self):
+        """ a job that can not decode the image is marked failed """
+        self.recipe.image = SimpleUploadedFile('broken.jpg', b'not an image')
+        self.recipe.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue_image_job(self.recipe)
+
+        job.refresh_from_db()
+        self.recipe.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(self.recipe.image_status, 'failed')
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=0)
+    def test_job_of_replaced_image_is_dropped(self):
+        """ a job finishing after the image changed leaves the recipe alone """
+        self._attach_image()
+        self.addCleanup(default_storage.delete, self.recipe.image.name)
+
+        def replace_image(recipe):
+            Recipe.objects.filter(id=recipe.id).update(image='uploads/recipe/new.jpg')
+            return {'thumbnail': {'name': 'old_thumbnail.jpg'}}
+
+        with patch('recipe.images.build_variants', side_effect=replace_image):
+            with self.captureOnCommitCallbacks(execute=True):
+                job = enqueue_image_job(self.recipe)
+
+        job.refresh_from_db()
+        self.recipe.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(self.recipe.image.name, 'uploads/recipe/new.jpg')
+        self.assertEqual(self.recipe.image_variants, {})
+        self.assertEqual(self.recipe.image_status, '')
+
+    def _attach_image(self, size=(1000, 500)):
+        """ store an image on the recipe without running the pipeline """
+        buffer = BytesIO()
+        Image.new('RGB', size).save(buffer, format='JPEG')
+        self.recipe.image = SimpleUploadedFile('photo.jpg', buffer.getvalue())
+        self.recipe.save()
+
+    def test_list_links_missing_variants_to_lazy_view(self):
+        """ list responses point at the lazy view until a variant exists """
+        self._attach_image()
+
+        res = self.client.get(RECIPE_URL)
+
+        variants = res.data['results'][0]['image_variants']
+        self.assertEqual(set(variants), {'thumbnail', 'medium'})
+        self.assertIsNone(variants['thumbnail']['width'])
+        self.assertTrue(variants['thumbnail']['url'].endswith(
+            image_variant_url(self.recipe.id, 'thumbnail')
+        ))
+
+    def test_lazy_variant_is_generated_once(self):
+        """ the first request builds the variant and later lists show it """
+        self._attach_image()
+        url = image_variant_url(self.recipe.id, 'thumbnail')
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        self.recipe.refresh_from_db()
+        thumbnail = self.recipe.image_variants['thumbnail']
+        self.assertTrue(default_storage.exists(thumbnail['name']))
+        self.assertEqual(res['Location'], default_storage.url(thumbnail['name']))
+
+        with patch('recipe.images.build_variants') as build:
+            self.client.get(url)
+        build.assert_not_called()
+
+        res = self.client.get(RECIPE_URL)
+        listed = res.data['results'][0]['image_variants']['thumbnail']
+        self.assertEqual((listed['width'], listed['height']), (200, 100))
+        self.assertEqual(listed['size'], thumbnail['size'])
+
+    def test_lazy_variant_of_replaced_image(self):
+        """ a stored entry of the previous image is not redirected to """
+        self._attach_image()
+        url = image_variant_url(self.recipe.id, 'thumbnail')
+        self.client.get(url)
+        self.recipe.refresh_from_db()
+        old_image = self.recipe.image.name
+        old_thumbnail = self.recipe.image_variants['thumbnail']['name']
+        self.addCleanup(default_storage.delete, old_image)
+        self.addCleanup(default_storage.delete, old_thumbnail)
+
+        self._attach_image(size=(600, 300))
+        res = self.client.get(url)
+
+        self.recipe.refresh_from_db()
+        thumbnail = self.recipe.image_variants['thumbnail']['name']
+        self.assertNotEqual(thumbnail, old_thumbnail)
+        self.assertEqual(res['Location'], default_storage.url(thumbnail))
+
+    def test_lazy_variant_of_broken_image(self):
+        """ an original that can't be decoded is a 404 and no longer linked """
+        self.recipe.image = SimpleUploadedFile('broken.jpg', b'not an image')
+        self.recipe.save()
+        url = image_variant_url(self.recipe.id, 'thumbnail')
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'failed')
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][0]['image_variants'], {})
+        with patch('recipe.images.build_variants') as build:
+            res = self.client.get(url)
+        build.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_concurrent_builds_keep_variant_names(self):
+        """ a variant built twice keeps its fixed, content addressed name """
+        self._attach_image()
+        first = build_variants(self.recipe)
+        self.recipe.image_variants = first
+        self.recipe.save()
+        exists = default_storage.exists
+        checked = set()
+
+        def racing_exists(name):
+            # as if another job stored the variant after this one checked
+            if name not in checked:
+                checked.add(name)
+                return False
+            return exists(name)
+
+        with patch.object(default_storage, 'exists', side_effect=racing_exists):
+            second = build_variants(self.recipe)
+
+        for name, data in second.items():
+            self.assertEqual(data['name'], first[name]['name'])
+            self.assertEqual(data['name'], variant_name(self.recipe.image.name, name))
+        stem = os.path.splitext(os.path.basename(self.recipe.image.name))[0]
+        directory = os.path.dirname(default_storage.path(first['thumbnail']['name']))
+        self.assertEqual(
+            sorted(n for n in os.listdir(directory) if n.startswith(stem)),
+            sorted(os.path.basename(data['name']) for data in first.values()),
+        )
+
+    def test_unknown_variant(self):
+        """ unknown variant names return 404 """
+        self._attach_image()
+
+        res = self.client.get(image_variant_url(self.recipe.id, 'huge'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
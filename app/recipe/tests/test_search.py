@@ -0,0 +1,116 @@
+"""
+Tests for full-text recipe search.
+"""
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (Recipe,Tag,Ingredient)
+from recipe.search import search_recipes
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+def create_user(email="test@example.com", password="testpassword"):
+    """ create user and return it """
+    return get_user_model().objects.create_user(email,password)
+
+def create_recipe(user, **params):
+    """ create and return a sample recipe """
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchTest(TestCase):
+    """ test the search query param """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def _titles(self, **params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_search_all_fields(self):
+        """ title, description, tag and ingredient names are searched """
+        create_recipe(self.user, title='Curry night')
+        create_recipe(self.user, title='By description', description='a mild curry')
+        by_tag = create_recipe(self.user, title='By tag')
+        by_tag.tag.add(Tag.objects.create(user=self.user, name='curry'))
+        by_ingredient = create_recipe(self.user, title='By ingredient')
+        by_ingredient.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='curry paste')
+        )
+        create_recipe(self.user, title='Pancakes')
+
+        titles = self._titles(search='curry')
+
+        self.assertEqual(
+            set(titles), {'Curry night', 'By description', 'By tag', 'By ingredient'},
+        )
+
+    def test_title_matches_rank_first(self):
+        create_recipe(self.user, title='Stew', description='with lemon')
+        create_recipe(self.user, title='Lemon cake')
+
+        self.assertEqual(self._titles(search='lemon'), ['Lemon cake', 'Stew'])
+
+    def test_all_terms_must_match(self):
+        create_recipe(self.user, title='Spicy soup')
+        create_recipe(self.user, title='Spicy noodles')
+
+        self.assertEqual(self._titles(search='spicy soup'), ['Spicy soup'])
+
+    def test_search_is_limited_to_user(self):
+        create_recipe(create_user(email='other@example.com'), title='Soup')
+
+        self.assertEqual(self._titles(search='soup'), [])
+
+    def test_search_pages(self):
+        """ ranked results page through the cursor without repeats """
+        for i in range(5):
+            create_recipe(self.user, title=f'Soup {i}')
+        create_recipe(self.user, title='Bread', description='goes with soup')
+
+        titles = []
+        res = self.client.get(RECIPE_URL, {'search': 'soup', 'page_size': 2})
+        while True:
+            titles += [recipe['title'] for recipe in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(titles), 6)
+        self.assertEqual(len(set(titles)), 6)
+        self.assertEqual(titles[-1], 'Bread')
+
+    @skipUnless(connection.vendor == 'postgresql', 'search vectors need Postgres')
+    def test_vector_follows_tag_changes(self):
+        """ adding and renaming tags refreshes the stored vector """
+        recipe = create_recipe(self.user, title='Dinner')
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        recipe.tag.add(tag)
+        queryset = Recipe.objects.filter(user=self.user)
+        self.assertTrue(search_recipes(queryset, 'vegan').exists())
+
+        tag.name = 'vegetarian'
+        tag.save()
+
+        self.assertFalse(search_recipes(queryset, 'vegan').exists())
+        self.assertTrue(search_recipes(queryset, 'vegetarian').exists())
@@ -49,7 +49,7 @@ class PrivateTestTag(TestCase):
         serializers = TagSerializer(tags,many=True)
         
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(res.data,serializers.data)
+        self.assertEqual(res.data['results'],serializers.data)
         
     def test_limited_tag(self):
         """ test tags are shown for the user that created that tag """
@@ -61,9 +61,9 @@ class PrivateTestTag(TestCase):
         res = self.client.get(TAG_URL)
         
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(len(res.data),1)
-        self.assertEqual(res.data[0]['name'],tag2.name)
-        self.assertEqual(res.data[0]['id'],tag2.id)
+        self.assertEqual(len(res.data['results']),1)
+        self.assertEqual(res.data['results'][0]['name'],tag2.name)
+        self.assertEqual(res.data['results'][0]['id'],tag2.id)
     
     def test_update_tag(self):
         """ test for updating a tag """
@@ -100,10 +100,11 @@ class PrivateTestTag(TestCase):
 
         res = self.client.get(TAG_URL, {'assigned_only': 1})
 
+        tag1.refresh_from_db()
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filtered_tags_unique(self):
         """Test filtered tags returns a unique list."""
@@ -126,4 +127,69 @@ class PrivateTestTag(TestCase):
 
         res = self.client.get(TAG_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tags_paginated_by_name(self):
+        """ tags are paged by name with a next cursor """
+        for name in ['a', 'b', 'c']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAG_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in res.data['results']], ['c', 'b'])
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual([t['name'] for t in res.data['results']], ['a'])
+        self.assertIsNone(res.data['next'])
+
+    def test_rename_tag_to_existing_name(self):
+        """ renaming a tag to a name already in use is rejected """
+        Tag.objects.create(user=self.user, name='lunch')
+        tag = Tag.objects.create(user=self.user, name='dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'lunch'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'dinner')
+
+    def test_usage_count_follows_links(self):
+        """ counters change with adds, removes, clears and deletes """
+        vegan = Tag.objects.create(user=self.user, name='vegan')
+        quick = Tag.objects.create(user=self.user, name='quick')
+        recipes = [
+            Recipe.objects.create(
+                user=self.user, title=f'recipe {i}',
+                time_minutes=5, price=Decimal('1.00'),
+            )
+            for i in range(3)
+        ]
+
+        def counts():
+            return dict(Tag.objects.values_list('name', 'usage_count'))
+
+        recipes[0].tag.add(vegan, quick)
+        vegan.recipe_set.add(recipes[1], recipes[2])
+        self.assertEqual(counts(), {'vegan': 3, 'quick': 1})
+
+        recipes[0].tag.remove(quick, quick)
+        vegan.recipe_set.remove(recipes[1])
+        self.assertEqual(counts(), {'vegan': 2, 'quick': 0})
+
+        recipes[1].tag.remove(vegan)
+        recipes[2].tag.set([quick])
+        self.assertEqual(counts(), {'vegan': 1, 'quick': 1})
+
+        recipes[0].delete()
+        quick.recipe_set.clear()
+        self.assertEqual(counts(), {'vegan': 0, 'quick': 0})
+
+    def test_usage_count_in_response(self):
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        Recipe.objects.create(
+            user=self.user, title='Salad', time_minutes=5, price=Decimal('1.00'),
+        ).tag.add(tag)
+
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(res.data['results'][0]['usage_count'], 1)
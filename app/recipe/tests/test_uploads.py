@@ -0,0 +1,174 @@
+"""
+Tests for chunked, resumable image uploads.
+"""
+import os
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import (TestCase,override_settings)
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (ImageJob,ImageUpload,Recipe)
+
+CHUNK_TYPE = 'application/offset+octet-stream'
+
+
+def uploads_url(recipe_id):
+    """ create and return the url starting an upload """
+    return reverse('recipe:recipe-uploads', args=[recipe_id])
+
+def upload_url(recipe_id, upload_id):
+    """ create and return the url of an upload """
+    return reverse('recipe:recipe-upload', args=[recipe_id, upload_id])
+
+def finalize_url(recipe_id, upload_id):
+    """ create and return the url finishing an upload """
+    return reverse('recipe:recipe-upload-finalize', args=[recipe_id, upload_id])
+
+def jpeg_bytes(size=(300, 200)):
+    """ return the content of a sample JPEG image """
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class ResumableUploadTest(TestCase):
+    """ test the tus style upload endpoints """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123!',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Sample recipe',
+            time_minutes=10, price=Decimal('5.00'),
+        )
+        self.content = jpeg_bytes()
+
+    def tearDown(self):
+        for upload in ImageUpload.objects.all():
+            upload.recipe.image.storage.delete(upload.partial_name)
+        self.recipe.refresh_from_db()
+        for data in self.recipe.image_variants.values():
+            default_storage.delete(data['name'])
+        if self.recipe.image:
+            self.recipe.image.delete()
+
+    def _start(self, length=None):
+        res = self.client.post(
+            uploads_url(self.recipe.id),
+            HTTP_UPLOAD_LENGTH=str(length or len(self.content)),
+        )
+        return res
+
+    def _patch(self, upload_id, offset, chunk):
+        return self.client.patch(
+            upload_url(self.recipe.id, upload_id), chunk,
+            content_type=CHUNK_TYPE, HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=0)
+    def test_upload_in_chunks(self):
+        """ chunks are appended and finalize attaches the image """
+        res = self._start()
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res['Upload-Offset'], '0')
+        upload_id = res.data['id']
+        self.assertTrue(res['Location'].endswith(
+            upload_url(self.recipe.id, upload_id)
+        ))
+
+        half = len(self.content) // 2
+        res = self._patch(upload_id, 0, self.content[:half])
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(res['Upload-Offset'], str(half))
+
+        res = self.client.head(upload_url(self.recipe.id, upload_id))
+        self.assertEqual(res['Upload-Offset'], str(half))
+
+        self._patch(upload_id, half, self.content[half:])
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(finalize_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        with self.recipe.image.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertEqual(self.recipe.image_status, ImageJob.DONE)
+        self.assertFalse(ImageUpload.objects.exists())
+        partial_dir = self.recipe.image.storage.path('uploads/recipe/partial')
+        self.assertEqual(os.listdir(partial_dir), [])
+
+    def test_finalize_drops_old_variants(self):
+        """ a finalized upload shows no variants of the previous image """
+        self.recipe.image_variants = {
+            'thumbnail': {'name': 'uploads/recipe/variants/old_thumbnail.jpg'},
+        }
+        self.recipe.save()
+        upload_id = self._start().data['id']
+        self._patch(upload_id, 0, self.content)
+
+        res = self.client.post(finalize_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_offset_mismatch_conflicts(self):
+        """ a chunk sent at the wrong offset is rejected """
+        upload_id = self._start().data['id']
+
+        res = self._patch(upload_id, 10, self.content[10:20])
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(ImageUpload.objects.get(id=upload_id).offset, 0)
+
+    def test_non_image_rejected_on_first_chunk(self):
+        """ content is sniffed before anything is written """
+        upload_id = self._start(length=100).data['id']
+
+        res = self._patch(upload_id, 0, b'%PDF-1.4 not an image')
+
+        self.assertEqual(res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertEqual(ImageUpload.objects.get(id=upload_id).offset, 0)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1000)
+    def test_size_limits(self):
+        """ oversized uploads and chunks past the length are rejected """
+        res = self._start(length=1001)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        upload_id = self._start(length=10).data['id']
+        res = self._patch(upload_id, 0, self.content[:11])
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalize_incomplete_upload(self):
+        """ finalize waits until every byte has arrived """
+        upload_id = self._start().data['id']
+        self._patch(upload_id, 0, self.content[:100])
+
+        res = self.client.post(finalize_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_other_user_upload_not_found(self):
+        """ uploads of recipes of other users are hidden """
+        upload_id = self._start().data['id']
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123!',
+        )
+        self.client.force_authenticate(user=other)
+
+        res = self._patch(upload_id, 0, self.content)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
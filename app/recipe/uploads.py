@@ -0,0 +1,166 @@
+"""
+Chunked, resumable recipe image uploads.
+
+the flow follows tus: create an upload with its total length, PATCH chunks
+at the current offset, then finalize it. chunks go straight from the
+request stream to a partial file in the image storage, so neither the
+request nor the finished file is ever held in memory.
+"""
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import locks
+from django.core.files.base import File
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+from rest_framework import status
+from rest_framework.exceptions import (APIException,UnsupportedMediaType,ValidationError)
+
+from core.models import (ImageJob,ImageUpload,Recipe)
+from recipe.images import enqueue_image_job
+
+CHUNK_SIZE = 64 * 1024
+# uploads untouched this long are dropped by gc_images
+UPLOAD_EXPIRY = timedelta(hours=24)
+# leading bytes of the image types Pillow and the variants handle
+SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a', b'RIFF')
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+
+class UploadConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Upload-Offset does not match the upload.'
+    default_code = 'offset_conflict'
+
+
+class PartialFile(File):
+    """ a finished partial file, moved rather than copied when saved """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def _storage():
+    return Recipe._meta.get_field('image').storage
+
+
+def sniff_image(head):
+    """ reject content that can not be the start of a supported image """
+    for signature in SIGNATURES:
+        size = min(len(head), len(signature))
+        if head[:size] == signature[:size]:
+            if signature == b'RIFF' and len(head) >= 12 and head[8:12] != b'WEBP':
+                continue
+            return
+    raise UnsupportedMediaType(
+        'image', detail='Upload content is not a JPEG, PNG, GIF or WebP image.',
+    )
+
+
+def create_upload(recipe, length):
+    """ start an upload of length bytes with an empty partial file """
+    if length <= 0:
+        raise ValidationError({'Upload-Length': ['Must be a positive integer.']})
+    if length > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise ValidationError({'Upload-Length': [
+            f'Images are limited to {settings.IMAGE_UPLOAD_MAX_SIZE} bytes.'
+        ]})
+    upload = ImageUpload.objects.create(recipe=recipe, length=length)
+    path = _storage().path(upload.partial_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return upload
+
+
+def append_chunk(upload, offset, stream):
+    """ append the stream at offset and return the new offset
+
+    an exclusive lock on the partial file serializes concurrent PATCH
+    requests, the offset is re-read once the lock is held. bytes received
+    before the client goes away are kept so the upload can resume.
+    """
+    path = _storage().path(upload.partial_name)
+    try:
+        file = open(path, 'r+b')
+    except FileNotFoundError:
+        raise ValidationError({'upload': ['The partial file is gone, start over.']})
+    with file:
+        locks.lock(file, locks.LOCK_EX)
+        upload.refresh_from_db(fields=['offset'])
+        if offset != upload.offset:
+            raise UploadConflict()
+        file.seek(offset)
+        written = 0
+        try:
+            while stream is not None:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if offset + written + len(chunk) > upload.length:
+                    raise ValidationError(
+                        {'upload': ['Chunk exceeds the declared Upload-Length.']}
+                    )
+                if offset + written < 16:
+                    sniff_image(_head(file, offset + written) + chunk)
+                file.write(chunk)
+                written += len(chunk)
+        finally:
+            # drop a half written chunk past the saved offset
+            file.truncate(offset + written)
+            file.flush()
+            ImageUpload.objects.filter(id=upload.id).update(offset=offset + written)
+            upload.offset = offset + written
+    return upload.offset
+
+
+def _head(file, size):
+    """ read the first bytes already written, keeping the file position """
+    position = file.tell()
+    file.seek(0)
+    head = file.read(size)
+    file.seek(position)
+    return head
+
+
+def finalize_upload(upload):
+    """ check the complete file and attach it to the recipe as its image """
+    if upload.offset != upload.length:
+        raise UploadConflict(
+            f'Upload is at {upload.offset} of {upload.length} bytes.'
+        )
+    storage = _storage()
+    path = storage.path(upload.partial_name)
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        discard_upload(upload)
+        raise ValidationError({'image': ['Upload a valid image.']})
+    if image_format not in EXTENSIONS:
+        discard_upload(upload)
+        raise UnsupportedMediaType(image_format)
+
+    recipe = upload.recipe
+    partial_name = upload.partial_name
+    with open(path, 'rb') as file, transaction.atomic():
+        # the content addressed storage hashes the file and moves it in place
+        recipe.image.save(
+            f'upload{EXTENSIONS[image_format]}', PartialFile(file), save=False,
+        )
+        recipe.image_status = ImageJob.PENDING
+        # the old variants belong to the old image
+        recipe.image_variants = {}
+        recipe.save()
+        enqueue_image_job(recipe)
+        upload.delete()
+    storage.delete(partial_name)
+    return recipe
+
+
+def discard_upload(upload):
+    """ delete an upload and its partial file """
+    partial_name = upload.partial_name
+    upload.delete()
+    _storage().delete(partial_name)
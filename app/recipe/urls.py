@@ -1,10 +1,12 @@
 """
 URL mappings for the recipe API.
 """
+from django.conf import settings
 from django.urls import (path , include)
 from rest_framework.routers import DefaultRouter
 
 from recipe import views
+from recipe.async_views import offload_patterns
 
 router = DefaultRouter()
 router.register('recipes',views.RecipeViewSet)
@@ -12,6 +14,12 @@ router.register('tags',views.TagViewSet)
 router.register('ingredients',views.IngredientViewSet)
 app_name = 'recipe'
 
+router_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = offload_patterns(router_urls)
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('db-pool-stats/', views.DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('', include(router_urls)),
     ]
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Usage counters of tags and ingredients.
+
+Tag.usage_count and Ingredient.usage_count hold how many recipes link to
+each row. signal handlers and bulk writers adjust them with relative
+UPDATEs as links come and go, and the recount_usage command repairs any
+drift from the through tables.
+"""
+from collections import (Counter,defaultdict)
+
+from django.db.models import (Count,F,IntegerField,OuterRef,Subquery,Value)
+from django.db.models.functions import Coalesce
+
+from core.models import (Recipe,Tag,Ingredient)
+
+RECIPE_FIELDS = {Tag: 'tag', Ingredient: 'ingredients'}
+
+
+def link_column(model):
+    """ through table column pointing at a tag or ingredient """
+    return f'{model._meta.model_name}_id'
+
+
+def through_of(model):
+    return getattr(Recipe, RECIPE_FIELDS[model]).through
+
+
+def adjust_usage(model, deltas):
+    """ add each delta to the counter of its row, one UPDATE per delta """
+    ids_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            ids_by_delta[delta].append(pk)
+    for delta, ids in ids_by_delta.items():
+        model.objects.filter(pk__in=ids).update(
+            usage_count=F('usage_count') + delta
+        )
+
+
+def count_links(links, model):
+    """ count new through rows per tag or ingredient id """
+    column = link_column(model)
+    return Counter(getattr(link, column) for link in links)
+
+
+def actual_usage(model):
+    """ expression counting the through rows of each tag or ingredient """
+    column = link_column(model)
+    return Coalesce(
+        Subquery(
+            through_of(model).objects.filter(**{column: OuterRef('pk')})
+            .values(column)
+            .annotate(total=Count('id'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
@@ -1,4 +1,4 @@
-from crypt import methods
+import io
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -7,17 +7,56 @@ from drf_spectacular.utils import (
 )
 
 from rest_framework import (viewsets,mixins,status)
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import (IsAdminUser,IsAuthenticated)
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import (
+    NotFound,
+    UnsupportedMediaType,
+    ValidationError,
+)
 from recipe import serializers
-from core.models import (Recipe,Tag,Ingredient)
+from user.authentication import CachedTokenAuthentication
+from django.db import (IntegrityError,transaction)
+from django.db.models import Prefetch
+from django.core.files.storage import default_storage
+from django.http import (HttpResponseRedirect,StreamingHttpResponse)
+from django.urls import reverse
+from recipe.bulk import (
+    RecipeImporter,
+    iter_csv_export,
+    iter_json_array,
+    iter_ndjson,
+    iter_ndjson_export,
+)
+from recipe.autocomplete import (DEFAULT_LIMIT,MAX_LIMIT,suggest)
+from recipe.cache import (CachedListMixin,cache_stats)
+from recipe.conditional import ConditionalGetMixin
+from recipe.images import (IMAGE_ERRORS,VARIANTS,enqueue_image_job,ensure_variant)
+from recipe.filters import (
+    MATCH_ALL,
+    MATCH_ANY,
+    ORDERING_FIELDS,
+    filter_by_ranges,
+    filter_by_related,
+    parse_ordering,
+)
+from recipe.pagination import (RecipeCursorPagination,NameCursorPagination)
+from recipe.listing import FastListMixin
+from recipe.search import search_recipes
+from recipe.uploads import (append_chunk,create_upload,finalize_upload)
+from core.models import (ImageJob,ImageUpload,Recipe,Tag,Ingredient)
+from core.pool import pool_stats
+
+UPLOAD_ID = r'(?P<upload_id>[0-9a-f-]+)'
+
 @extend_schema_view(
     list=extend_schema(
         parameters=[
             OpenApiParameter(
-                'tags',
+                'tag',
                 OpenApiTypes.STR,
                 description='Comma separated list of tag IDs to filter',
             ),
@@ -26,42 +65,116 @@ from core.models import (Recipe,Tag,Ingredient)
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter',
             ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=[MATCH_ANY, MATCH_ALL],
+                description='Match recipes with any (default) or all of the '
+                            'given tags and ingredients.',
+            ),
+            OpenApiParameter(
+                'max_time',
+                OpenApiTypes.INT,
+                description='Only recipes taking at most this many minutes.',
+            ),
+            OpenApiParameter(
+                'min_price',
+                OpenApiTypes.NUMBER,
+                description='Only recipes costing at least this much.',
+            ),
+            OpenApiParameter(
+                'max_price',
+                OpenApiTypes.NUMBER,
+                description='Only recipes costing at most this much.',
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=[
+                    prefix + field
+                    for field in ORDERING_FIELDS for prefix in ('', '-')
+                ],
+                description='Sort order, newest first (-id) by default or '
+                            'best match first when searching.',
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Full-text search over title, description, tag '
+                            'and ingredient names, best matches first.',
+            ),
+            OpenApiParameter(
+                'page_size',
+                OpenApiTypes.INT,
+                description='Number of recipes per page.',
+            ),
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin,CachedListMixin,FastListMixin,viewsets.ModelViewSet,
+):
     """View for manage recipe APIs."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _search_text(self):
+        return self.request.query_params.get('search', '').strip()
+
+    def get_ordering(self):
+        """ ordering of recipes, also used as the pagination cursor """
+        ordering = self.request.query_params.get('ordering')
+        if ordering:
+            return parse_ordering(ordering)
+        if self._search_text():
+            return ('-rank', '-id')
+        return ('-id',)
+
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
         tag = self.request.query_params.get('tag')
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', MATCH_ANY)
+        if match not in (MATCH_ANY, MATCH_ALL):
+            raise ValidationError({'match': [f'Choose {MATCH_ANY} or {MATCH_ALL}.']})
         queryset = self.queryset
         if tag:
             tag_ids = self._params_to_ints(tag)
-            queryset = queryset.filter(tag__id__in=tag_ids)
+            queryset = filter_by_related(queryset, 'tag', tag_ids, match)
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = filter_by_related(
+                queryset, 'ingredients', ingredient_ids, match
+            )
+        queryset = filter_by_ranges(queryset, self.request.query_params)
+        search = self._search_text()
+        if search:
+            queryset = search_recipes(queryset, search)
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-id').distinct()
+        ).order_by(*self.get_ordering()).defer(
+            'search_vector'
+        ).prefetch_related(
+            # ordered like recipe.listing so both paths render the same
+            Prefetch('tag', queryset=Tag.objects.order_by('id')),
+            Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+        )
     
     def get_serializer_class(self):
         """ return serializer class for each request """
         
         if self.action == "list":
             return serializers.RecipeSerializer
-        elif self.action == "upload_image":
+        elif self.action in ("upload_image","finish_upload"):
             return serializers.ImageSerializer
+        elif self.action in ("import_recipes","export_recipes"):
+            return serializers.RecipeImportSerializer
         
         return self.serializer_class
     
@@ -76,9 +189,143 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe,data=request.data)
         
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data,status= status.HTTP_200_OK)
+            with transaction.atomic():
+                # the old variants belong to the old image
+                serializer.save(image_status=ImageJob.PENDING, image_variants={})
+                enqueue_image_job(recipe)
+            return Response(serializer.data,status= status.HTTP_202_ACCEPTED)
         return Response(serializer.errors,status= status.HTTP_400_BAD_REQUEST)
+
+    def _get_upload(self,upload_id):
+        """ return an upload of the recipe in the url """
+        recipe=self.get_object()
+        upload=get_object_or_404(ImageUpload,recipe=recipe,id=upload_id)
+        upload.recipe=recipe
+        return upload
+
+    def _upload_response(self,upload,status_code=status.HTTP_200_OK):
+        """ describe an upload in the body and in tus style headers """
+        response = Response(
+            {'id': upload.id,'offset': upload.offset,'length': upload.length},
+            status= status_code,
+        )
+        response['Upload-Offset'] = str(upload.offset)
+        response['Upload-Length'] = str(upload.length)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    @action(methods=['POST'],detail=True,url_path='uploads',url_name='uploads')
+    def start_upload(self,request,pk=None):
+        """ start a resumable image upload of Upload-Length bytes """
+        recipe=self.get_object()
+        try:
+            length = int(request.headers.get('Upload-Length',''))
+        except ValueError:
+            raise ValidationError({'Upload-Length': ['Send the image size in bytes.']})
+        upload = create_upload(recipe,length)
+        response = self._upload_response(upload,status.HTTP_201_CREATED)
+        response['Location'] = request.build_absolute_uri(
+            reverse('recipe:recipe-upload',args=[recipe.id,upload.id])
+        )
+        return response
+
+    @action(
+        methods=['GET','PATCH'],detail=True,
+        url_path=f'uploads/{UPLOAD_ID}',url_name='upload',
+    )
+    def upload_chunk(self,request,pk=None,upload_id=None):
+        """ report the offset of an upload or append a chunk at it """
+        upload=self._get_upload(upload_id)
+        if request.method != 'PATCH':
+            return self._upload_response(upload)
+
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type != 'application/offset+octet-stream':
+            raise UnsupportedMediaType(content_type)
+        try:
+            offset = int(request.headers.get('Upload-Offset',''))
+        except ValueError:
+            raise ValidationError({'Upload-Offset': ['Send the offset of the chunk.']})
+        append_chunk(upload,offset,request.stream)
+        response = self._upload_response(upload)
+        response.status_code = status.HTTP_204_NO_CONTENT
+        response.data = None
+        return response
+
+    @action(
+        methods=['POST'],detail=True,
+        url_path=f'uploads/{UPLOAD_ID}/finalize',url_name='upload-finalize',
+    )
+    def finish_upload(self,request,pk=None,upload_id=None):
+        """ attach a complete upload to the recipe and process it """
+        recipe = finalize_upload(self._get_upload(upload_id))
+        serializer = self.get_serializer(recipe)
+        return Response(serializer.data,status= status.HTTP_202_ACCEPTED)
+
+    @action(
+        methods=['GET'],detail=True,
+        url_path=r'image/(?P<variant>[a-z]+)',url_name='image-variant',
+    )
+    def image_variant(self,request,pk=None,variant=None):
+        """ redirect to an image variant, generating it on first use """
+        recipe=self.get_object()
+        if (
+            variant not in VARIANTS or not recipe.image
+            or recipe.image_status == ImageJob.FAILED
+        ):
+            raise NotFound()
+        try:
+            data = ensure_variant(recipe,variant)
+        except IMAGE_ERRORS:
+            raise NotFound()
+        return HttpResponseRedirect(default_storage.url(data['name']))
+
+    @action(methods=['POST'],detail=False,url_path='import',url_name='import')
+    def import_recipes(self,request):
+        """ import recipes from a streamed NDJSON or JSON array body """
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type in ('application/x-ndjson','application/jsonl'):
+            reader = iter_ndjson
+        elif content_type == 'application/json':
+            reader = iter_json_array
+        else:
+            raise UnsupportedMediaType(content_type)
+
+        stream = request.stream or io.BytesIO()
+        result = RecipeImporter(request.user).run(reader(stream))
+        return Response(result,status= status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'export_format',
+                OpenApiTypes.STR, enum=['ndjson', 'csv'],
+                description='Export file format, ndjson by default.',
+            ),
+        ]
+    )
+    @action(methods=['GET'],detail=False,url_path='export',url_name='export')
+    def export_recipes(self,request):
+        """ stream all recipes of the user as NDJSON or CSV """
+        export_format = request.query_params.get('export_format','ndjson')
+        exporters = {
+            'ndjson': (iter_ndjson_export,'application/x-ndjson'),
+            'csv': (iter_csv_export,'text/csv'),
+        }
+        if export_format not in exporters:
+            return Response(
+                {'export_format': [f'Choose one of {", ".join(exporters)}.']},
+                status= status.HTTP_400_BAD_REQUEST,
+            )
+        exporter, content_type = exporters[export_format]
+        response = StreamingHttpResponse(
+            exporter(self.get_queryset()),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_format}"'
+        )
+        return response
         
 @extend_schema_view(
     list=extend_schema(
@@ -88,16 +335,24 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.',
             ),
+            OpenApiParameter(
+                'page_size',
+                OpenApiTypes.INT,
+                description='Number of items per page.',
+            ),
         ]
     )
 )
-class BaseView(mixins.DestroyModelMixin,
+class BaseView(ConditionalGetMixin,
+               CachedListMixin,
+               mixins.DestroyModelMixin,
                mixins.UpdateModelMixin,
                mixins.ListModelMixin,
                viewsets.GenericViewSet):
     """ base viewset """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = NameCursorPagination
     def get_queryset(self):
         """Filter queryset to authenticated user."""
         assigned_only = bool(
@@ -105,11 +360,47 @@ class BaseView(mixins.DestroyModelMixin,
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            # usage_count is kept by recipe.usage, no join is needed
+            queryset = queryset.filter(usage_count__gt=0)
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by('-name')
+
+    def perform_update(self, serializer):
+        """ reject renaming to a name the user already has """
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {'name': ['An item with this name already exists.']}
+            )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q', OpenApiTypes.STR,
+                description='Name prefix, matched case-insensitively.',
+            ),
+            OpenApiParameter(
+                'limit', OpenApiTypes.INT,
+                description=f'Number of suggestions, {DEFAULT_LIMIT} by '
+                            f'default and at most {MAX_LIMIT}.',
+            ),
+        ]
+    )
+    @action(methods=['GET'],detail=False,url_path='autocomplete',url_name='autocomplete')
+    def autocomplete(self, request):
+        """ names starting with q, the ones used by most recipes first """
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ValidationError({'limit': [f'Choose between 1 and {MAX_LIMIT}.']})
+        prefix = request.query_params.get('q', '').strip()
+        return Response(suggest(self.queryset.model, request.user.id, prefix, limit))
         
 class TagViewSet(BaseView):
     """ view for tag API """
@@ -122,4 +413,21 @@ class IngredientViewSet(BaseView):
     """ view for ingredient API """
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
-   
\ No newline at end of file
+
+
+class CacheStatsView(APIView):
+    """ view for response cache counters of this worker """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+class DatabasePoolStatsView(APIView):
+    """ view for the database connection pools of this worker """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(pool_stats())
@@ -0,0 +1,75 @@
+"""
+authentication classes for the api
+"""
+import copy
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.routers import set_request_user
+
+
+def token_cache_key(key):
+    """ cache key for a token, hashed so raw tokens are never stored as keys """
+    return f'auth_token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def forget_token(key):
+    """ drop a cached token resolution
+
+    inside a transaction it is dropped again once it commits, as a
+    concurrent request may cache the row as it was before the change.
+    """
+    cache_key = token_cache_key(key)
+    cache.delete(cache_key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(cache_key))
+
+
+def cached_user_entry(user):
+    """ what the token cache keeps for a user: no password hash, no key """
+    user = copy.copy(user)
+    user.password = ''
+    # related rows, e.g. the token itself, stay out of the entry
+    user._state.fields_cache = {}
+    return {'user_id': user.pk, 'user': user}
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ token authentication that caches the token to user lookup
+
+    entries expire after AUTH_TOKEN_CACHE_TIMEOUT seconds and are dropped
+    when the token is deleted or its user is saved, e.g. deactivated. off
+    unless CACHE_SHARED, other workers would keep a dropped entry.
+    """
+
+    def authenticate_credentials(self, key):
+        user, token = self._resolve(key)
+        # the replica router keeps a user who just wrote on the primary
+        set_request_user(user.id)
+        return (user, token)
+
+    def _resolve(self, key):
+        if not settings.CACHE_SHARED:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        entry = cache.get(cache_key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(
+                cache_key, cached_user_entry(user),
+                settings.AUTH_TOKEN_CACHE_TIMEOUT,
+            )
+            return (user, token)
+
+        user = entry['user']
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        # rebuilt from the presented key, the entry never holds it
+        return (user, Token(key=key, user_id=entry['user_id'], user=user))
@@ -0,0 +1,36 @@
+"""
+Password hashers with costs taken from settings.
+
+the algorithm names are Django's own, so hashes stay readable by the stock
+hashers. changing a cost makes must_update true for older hashes, and
+Django rehashes them on the next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """ Argon2id with ARGON2_TIME_COST, ARGON2_MEMORY_COST and ARGON2_PARALLELISM """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """ bcrypt over a sha256 digest with BCRYPT_ROUNDS """
+
+    @property
+    def rounds(self):
+        return settings.BCRYPT_ROUNDS
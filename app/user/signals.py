@@ -0,0 +1,24 @@
+"""
+signal handlers for the user api
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete,post_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import forget_token
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """ a deleted token must stop authenticating at once """
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_user_tokens(sender, instance, created, **kwargs):
+    """ cached tokens hold a copy of the user, refresh it on every change """
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        forget_token(key)
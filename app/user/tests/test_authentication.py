@@ -0,0 +1,99 @@
+""" test for cached token authentication """
+import pickle
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (TestCase,override_settings)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import token_cache_key
+
+ME_URL = reverse('user:me')
+TAG_URL = reverse('recipe:tag-list')
+
+
+# one test process shares its LocMemCache
+@override_settings(CACHE_SHARED=True)
+class CachedTokenAuthenticationTest(TestCase):
+    """ test token lookups are cached and invalidated """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='password123', name='name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_query(self):
+        """ the token is resolved from the cache after the first request """
+        self.client.get(ME_URL)
+
+        # only the profile itself is read
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token(self):
+        """ unknown tokens are rejected """
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_is_rejected(self):
+        """ deleting a token invalidates the cached lookup """
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """ deactivating a user invalidates the cached lookup """
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_is_visible(self):
+        """ updates through the api refresh the cached user """
+        self.client.patch(ME_URL, {'name': 'new name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'new name')
+
+    def test_profile_is_read_fresh(self):
+        """ the profile comes from the database, not the cached token """
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(id=self.user.id).update(name='changed')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'changed')
+
+    def test_cache_holds_no_secrets(self):
+        """ the cached entry has neither the password hash nor the key """
+        self.client.get(ME_URL)
+
+        entry = cache.get(token_cache_key(self.token.key))
+
+        self.assertEqual(entry['user_id'], self.user.id)
+        self.assertEqual(entry['user'].password, '')
+        self.assertNotIn(self.token.key.encode(), pickle.dumps(entry))
+        self.assertTrue(
+            get_user_model().objects.get(id=self.user.id).password
+        )
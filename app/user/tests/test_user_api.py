@@ -1,12 +1,18 @@
 """ test for user api """
 
+from unittest.mock import patch
+
 from django.test import TestCase
-from django.contrib.auth import get_user_model
+from django.contrib.auth import (authenticate,get_user_model)
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from user.throttling import LoginEmailRateThrottle
+
 CREATE_USER_API = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL =  reverse('user:me')
@@ -130,4 +136,48 @@ class PrivateUserApiTestCase(TestCase):
         self.user.refresh_from_db()
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(self.user.name , payload['name'])
-        self.assertTrue(self.user.check_password(payload['password']))
\ No newline at end of file
+        self.assertTrue(self.user.check_password(payload['password']))
+
+class LoginSecurityTest(TestCase):
+    """ test password hashing and login throttling """
+
+    def setUp(self):
+        # throttle history lives in the cache
+        cache.clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_new_passwords_use_argon2(self):
+        user = create_user(email='test@example.com', password='password123')
+
+        self.assertTrue(user.password.startswith('argon2$argon2id$'))
+
+    def test_old_hash_is_upgraded_on_login(self):
+        """ a PBKDF2 hash is replaced by the preferred hasher on login """
+        user = create_user(email='test@example.com', password='password123')
+        user.password = make_password('password123', hasher='pbkdf2_sha256')
+        user.save()
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'test@example.com', 'password': 'password123'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertTrue(user.check_password('password123'))
+
+    def test_login_attempts_are_throttled_per_email(self):
+        """ guessing passwords for one email is cut off before hashing """
+        create_user(email='test@example.com', password='password123')
+        payload = {'email': 'test@example.com', 'password': 'wrong'}
+
+        with patch.object(LoginEmailRateThrottle, 'THROTTLE_RATES', {'login_email': '3/min'}), \
+                patch('user.serializers.authenticate', wraps=authenticate) as auth:
+            codes = [self.client.post(TOKEN_URL, payload).status_code for _ in range(4)]
+
+        self.assertEqual(codes[:3], [status.HTTP_400_BAD_REQUEST] * 3)
+        self.assertEqual(codes[3], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(auth.call_count, 3)
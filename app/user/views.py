@@ -1,8 +1,11 @@
 """create view for user api"""
-from rest_framework import generics , authentication,permissions
+from django.contrib.auth import get_user_model
+from rest_framework import generics ,permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from user.authentication import CachedTokenAuthentication
 from user.serializers import (UserSerializer,AuthTokenSerializer)
+from user.throttling import (LoginEmailRateThrottle,LoginRateThrottle)
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -13,14 +16,18 @@ class CreateTokenView(ObtainAuthToken):
     """ create new auth token for the user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [LoginRateThrottle, LoginEmailRateThrottle]
     
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """ manage authenticated user """
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        """ retrieve and  return authenticated user  """
-        return self.request.user
+        """ retrieve and  return authenticated user
+
+        read from the database, the cached token may hold an older copy.
+        """
+        return get_user_model().objects.get(pk=self.request.user.pk)
         
\ No newline at end of file